@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the revolut object model, on synthetic data (no network).
+Each benchmark is timed, then run again with tracemalloc to get its memory
+peak. The results are written as JSON, and compared with a baseline :
+    python -m benchmarks.bench_revolut --sizes 1000,10000 \
+        --baseline benchmarks/baseline.json
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import click
+
+import revolut_bot
+from revolut import Accounts, AccountTransactions, Amount, __version__
+
+_DEFAULT_SIZES = "1000,10000,100000"
+_DEFAULT_TOLERANCE = 0.25  # 25 % slower (or bigger) is a regression
+_FIRST_TIMESTAMP = 1570000000000  # ms
+
+
+def make_raw_accounts(size):
+    return [{"balance": index * 100, "currency": "EUR",
+             "type": "SAVINGS" if index % 2 else "CURRENT",
+             "vault_name": "Vault {}".format(index),
+             "state": "INACTIVE" if index % 10 == 0 else "ACTIVE"}
+            for index in range(size)]
+
+
+def make_raw_transactions(size):
+    return [{"id": "id{}".format(index),
+             "type": "CARD_PAYMENT",
+             "state": "PENDING" if index % 10 == 0 else "COMPLETED",
+             "startedDate": _FIRST_TIMESTAMP - index * 60000,
+             "completedDate": None if index % 10 == 0
+             else _FIRST_TIMESTAMP - index * 60000 + 1000,
+             "amount": -index,
+             "fee": 0,
+             "currency": "EUR",
+             "description": "Shop {}".format(index),
+             "account": {"id": "account_id"}}
+            for index in range(size)]
+
+
+def make_history_csv(size):
+    """ Content of a revolut_bot history file """
+    lines = [",".join(revolut_bot._CSV_COLUMNS)]
+    lines.extend("01/10/2019,12:{:02d}:{:02d},{},EUR,0.00{},BTC".format(
+        index // 60 % 60, index % 60, index % 1000 + 1, index)
+        for index in range(size))
+    return "\n".join(lines) + "\n"
+
+
+def setup_history_file(size):
+    f = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False)
+    with f:
+        f.write(make_history_csv(size))
+    return f.name
+
+
+def build_amounts(size):
+    return [Amount(revolut_amount=index, currency="EUR")
+            for index in range(size)]
+
+
+def build_real_amounts(size):
+    return [Amount(real_amount=index / 100, currency="EUR")
+            for index in range(size)]
+
+
+def build_account_transactions(raw_transactions):
+    # The AccountTransaction objects are built lazily : build all of them
+    return AccountTransactions(raw_transactions).list
+
+
+def build_account_transactions_csv(raw_transactions):
+    # Built in the timed function : the rows are cached after the first csv
+    return AccountTransactions(raw_transactions).csv()
+
+
+def format_dates(account_transactions):
+    return [account_transaction.get_datetime__str()
+            for account_transaction in account_transactions]
+
+
+def convert_history_dicts(history_dicts):
+    return [revolut_bot.dict_transaction_to_transaction(history_dict)
+            for history_dict in history_dicts]
+
+
+# name => (setup(size) returning the argument of the function, function,
+# cleanup(argument) or None)
+BENCHMARKS = {
+    "amount_revolut_amount": (lambda size: size, build_amounts, None),
+    "amount_real_amount": (lambda size: size, build_real_amounts, None),
+    "accounts": (make_raw_accounts, Accounts, None),
+    "account_transactions": (make_raw_transactions,
+                             build_account_transactions, None),
+    "accounts_csv": (lambda size: Accounts(make_raw_accounts(size)),
+                     lambda accounts: accounts.csv(), None),
+    "account_transactions_csv": (make_raw_transactions,
+                                 build_account_transactions_csv, None),
+    "get_datetime__str": (
+        lambda size: AccountTransactions(make_raw_transactions(size)).list,
+        format_dates, None),
+    "csv_to_dict": (make_history_csv, revolut_bot.csv_to_dict, None),
+    "get_last_transactions_from_csv": (
+        setup_history_file,
+        lambda filename: revolut_bot.get_last_transactions_from_csv(
+            filename=filename),
+        os.remove),
+    "dict_transaction_to_transaction": (
+        lambda size: revolut_bot.csv_to_dict(make_history_csv(size)),
+        convert_history_dicts, None),
+}
+
+
+def run_benchmark(function, argument, repeat):
+    """ Get the best time of repeat runs (in seconds), and the memory peak
+    of one run (in bytes) """
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function(argument)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak_bytes}
+
+
+def run_benchmarks(names, sizes, repeat):
+    results = {}
+    for name in names:
+        setup, function, cleanup = BENCHMARKS[name]
+        for size in sizes:
+            argument = setup(size)
+            try:
+                result = run_benchmark(function, argument, repeat)
+            finally:
+                if cleanup is not None:
+                    cleanup(argument)
+            results.setdefault(name, {})[str(size)] = result
+            print("{:<35} {:>9} rows : {:10.6f} s, {:>12} bytes".format(
+                name, size, result["seconds"], result["peak_bytes"]),
+                file=sys.stderr)
+    return results
+
+
+def compare_results(results, baseline_results, tolerance=_DEFAULT_TOLERANCE):
+    """ Get the regressions (list of strings) of results compared to
+    baseline_results, for the benchmarks and sizes found in both
+    >>> baseline = {"accounts": {"1000": {"seconds": 1., "peak_bytes": 100}}}
+    >>> compare_results({"accounts": {
+    ...     "1000": {"seconds": 1.1, "peak_bytes": 100}}}, baseline)
+    []
+    >>> compare_results({"accounts": {
+    ...     "1000": {"seconds": 2., "peak_bytes": 100}}}, baseline)
+    ['accounts (1000 rows) : seconds 1.0 => 2.0 (x2.00)']
+    """
+    regressions = []
+    for name, results_by_size in results.items():
+        for size, result in results_by_size.items():
+            baseline_result = baseline_results.get(name, {}).get(size)
+            if baseline_result is None:
+                continue
+            for measure in ["seconds", "peak_bytes"]:
+                before, after = baseline_result[measure], result[measure]
+                if before and after > before * (1 + tolerance):
+                    regressions.append(
+                        "{} ({} rows) : {} {} => {} (x{:.2f})".format(
+                            name, size, measure, before, after,
+                            after / before))
+    return regressions
+
+
+@click.command()
+@click.option(
+    '--sizes', '-s',
+    type=str,
+    help='comma-separated numbers of rows (ex : "1000,10000,1000000")',
+    default=_DEFAULT_SIZES,
+)
+@click.option(
+    '--benchmark', '-b',
+    type=click.Choice(list(BENCHMARKS)),
+    multiple=True,
+    help='benchmark to run (can be repeated, all by default)',
+)
+@click.option(
+    '--repeat', '-r',
+    type=click.IntRange(min=1),
+    help='number of timed runs (the best one is kept)',
+    default=3,
+)
+@click.option(
+    '--output_file', '-o',
+    type=click.Path(dir_okay=False, writable=True),
+    help='write the results (json) to this file instead of the standard '
+         'output (use it to create a new baseline)',
+)
+@click.option(
+    '--baseline',
+    type=click.Path(exists=True, dir_okay=False),
+    help='results (json) to compare with : exit with the status 1 '
+         'if a benchmark is slower or uses more memory',
+)
+@click.option(
+    '--tolerance',
+    type=float,
+    help='accepted ratio of increase compared to the baseline',
+    default=_DEFAULT_TOLERANCE,
+)
+def main(sizes, benchmark, repeat, output_file, baseline, tolerance):
+    """ Run the benchmarks of the revolut object model """
+    sizes = [int(size) for size in sizes.split(",")]
+    results = {
+        "revolut": __version__,
+        "python": platform.python_version(),
+        "results": run_benchmarks(benchmark or list(BENCHMARKS), sizes,
+                                  repeat),
+    }
+    results_json = json.dumps(results, indent=2, sort_keys=True)
+    if output_file:
+        with open(output_file, "w") as f:
+            f.write(results_json + "\n")
+    else:
+        print(results_json)
+
+    if baseline:
+        with open(baseline) as f:
+            baseline_results = json.load(f)["results"]
+        regressions = compare_results(results["results"], baseline_results,
+                                      tolerance=tolerance)
+        for regression in regressions:
+            print("Regression : {}".format(regression), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load test of the Revolut methods against the fake Revolut API
+(revolut.fake_server) : throughput and p50/p99 latencies at several
+concurrency levels.
+    python -m benchmarks.load_revolut --concurrency 1,8,32 --latency 0.05
+"""
+
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+
+from revolut import Amount, Revolut, get_percentile
+from revolut.fake_server import FakeRevolutServer
+
+_DEFAULT_CONCURRENCY = "1,4,16,64"
+
+
+def get_methods():
+    """ name => function(revolut) calling a Revolut method """
+    ten_euros = Amount(real_amount=10, currency="EUR")
+    return {
+        "quote": lambda revolut: revolut.quote(ten_euros, "BTC"),
+        "get_account_balances":
+            lambda revolut: revolut.get_account_balances(),
+        "get_account_transactions":
+            lambda revolut: revolut.get_account_transactions(
+                from_date=datetime.now() - timedelta(days=7)),
+        "exchange": lambda revolut: revolut.exchange(
+            Amount(real_amount=0.01, currency="EUR"), "BTC"),
+    }
+
+
+def run_load(revolut, method, calls, concurrency):
+    """ Call the method calls times, with concurrency threads.
+    Returns the throughput, the latencies and the number of errors """
+    def timed_call(_):
+        start = time.perf_counter()
+        try:
+            method(revolut)
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed_call, range(calls)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(result for result in results if result is not None)
+    return {
+        "calls": calls,
+        "errors": calls - len(latencies),
+        "calls_per_sec": calls / elapsed,
+        "p50_ms": _to_ms(get_percentile(latencies, 50)),
+        "p99_ms": _to_ms(get_percentile(latencies, 99)),
+    }
+
+
+def _to_ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+@click.command()
+@click.option(
+    '--method', '-m',
+    type=click.Choice(list(get_methods())),
+    multiple=True,
+    help='Revolut method to call (can be repeated, all except exchange '
+         'by default)',
+)
+@click.option(
+    '--concurrency', '-c',
+    type=str,
+    help='comma-separated numbers of concurrent threads',
+    default=_DEFAULT_CONCURRENCY,
+)
+@click.option(
+    '--calls', '-n',
+    type=click.IntRange(min=1),
+    help='number of calls for each method and concurrency level',
+    default=200,
+)
+@click.option(
+    '--api_base',
+    type=str,
+    help='url of an already running fake server '
+         '(by default, one is started with the options below)',
+)
+@click.option('--latency', type=float, default=0.02,
+              help='delay of the responses, in seconds')
+@click.option('--jitter', type=float, default=0.005,
+              help='random +/- variation of the delay, in seconds')
+@click.option('--error_rate', type=float, default=0.,
+              help='ratio of the requests answered with a 503')
+@click.option('--rate_limit', type=int, default=0,
+              help='maximum number of requests per second (0 : no limit)')
+@click.option('--history_size', type=int, default=1000,
+              help='number of transactions of the fake history')
+@click.option('--max_retries', type=click.IntRange(min=0), default=0,
+              help='retries of the client after an error')
+def main(method, concurrency, calls, api_base, latency, jitter, error_rate,
+         rate_limit, history_size, max_retries):
+    """ Measure the throughput and latencies of the Revolut methods """
+    methods = get_methods()
+    method_names = method or [name for name in methods if name != "exchange"]
+    concurrency_levels = [int(level) for level in concurrency.split(",")]
+    server = None
+    if api_base is None:
+        server = FakeRevolutServer(
+            latency=latency, jitter=jitter, error_rate=error_rate,
+            rate_limit=rate_limit, history_size=history_size).start()
+        api_base = server.api_base
+    results = {}
+    try:
+        for name in method_names:
+            for level in concurrency_levels:
+                revolut = Revolut(token="fake_token", device_id="fake_device",
+                                  api_base=api_base, wallet_cache_ttl=0,
+                                  pool_size=level, max_retries=max_retries)
+                result = run_load(revolut, methods[name], calls, level)
+                results.setdefault(name, {})[str(level)] = result
+                print("{:<25} x{:<4} : {:9.1f} calls/s, p50 {} ms, "
+                      "p99 {} ms, {} errors".format(
+                          name, level, result["calls_per_sec"],
+                          result["p50_ms"], result["p99_ms"],
+                          result["errors"]), file=sys.stderr)
+    finally:
+        if server is not None:
+            server.stop()
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,27 @@ This package allows you to communicate with your Revolut accounts
 """
 
 import base64
+import bisect
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import csv
 from datetime import datetime
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+import hashlib
+import io
 import json
+import random
 import requests
-from urllib.parse import urljoin
+import threading
+import time
+from urllib.parse import urljoin, urlparse
+
+try:
+    import orjson  # Faster JSON decoding, used when it is installed
+except ImportError:  # pragma: no cover
+    orjson = None
 
 __version__ = '0.1.4'  # Should be the same in setup.py
 
@@ -21,6 +38,68 @@ _URL_GET_TOKEN_STEP2 = API_BASE + "/signin/confirm"
 
 _DEFAULT_TOKEN_FOR_SIGNIN = "QXBwOlM5V1VuU0ZCeTY3Z1dhbjc="
 
+_DEFAULT_POOL_SIZE = 10
+_DEFAULT_TIMEOUT = (5, 30)  # (connect, read) in seconds
+_DEFAULT_MAX_RETRIES = 3
+_DEFAULT_BACKOFF_FACTOR = 0.5  # seconds
+_DEFAULT_BACKOFF_MAX = 30  # seconds
+_RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+_DEFAULT_RESPONSE_CACHE_SIZE = 64  # urls
+# Decode the responses (from bytes), with orjson when it is installed
+_DEFAULT_JSON_LOADS = orjson.loads if orjson is not None else json.loads
+# Upper bounds (in seconds) of the buckets of the latency histograms
+_DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                            1., 2.5, 5., 10.)
+# Paths with a variable part, reported as one endpoint in the metrics
+_ENDPOINT_PREFIXES = [
+    ("/quote/", "/quote/{pair}"),
+    ("/biometric-signin/confirm/", "/biometric-signin/confirm/{id}"),
+]
+
+_DEFAULT_QUOTE_CACHE_TTL = 10  # seconds
+_DEFAULT_QUOTE_CACHE_SIZE = 128  # currency pairs
+_DEFAULT_QUOTE_WORKERS = 8
+# The balances, the wallet id and the pockets can be read from the same
+# /user/current/wallet response during wallet_cache_ttl (no cache by default)
+_DEFAULT_WALLET_CACHE_TTL = 0  # seconds
+
+# Parsed once, at import
+_SIMU_EXCHANGE = json.loads('[{"account":{"id":"FAKE_ID"},\
+"amount":-1,"balance":0,"completedDate":123456789,\
+"counterpart":{"account":\
+{"id":"FAKE_ID"},\
+"amount":170,"currency":"BTC"},"currency":"EUR",\
+"description":"Exchanged to BTC","direction":"sell",\
+"fee":0,"id":"FAKE_ID",\
+"legId":"FAKE_ID","rate":0.0001751234,\
+"startedDate":123456789,"state":"COMPLETED","type":"EXCHANGE",\
+"updatedDate":123456789},\
+{"account":{"id":"FAKE_ID"},"amount":170,\
+"balance":12345,"completedDate":12345678,"counterpart":\
+{"account":{"id":"FAKE_ID"},\
+"amount":-1,"currency":"EUR"},"currency":"BTC",\
+"description":"Exchanged from EUR","direction":"buy","fee":0,\
+"id":"FAKE_ID",\
+"legId":"FAKE_ID",\
+"rate":5700.0012345,"startedDate":123456789,\
+"state":"COMPLETED","type":"EXCHANGE",\
+"updatedDate":123456789}]')
+
+_SIMU_GET_TOKEN = json.loads('{"user":{"id":"fakeuserid",\
+"createdDate":123456789,\
+"address":{"city":"my_city","country":"FR","postcode":"12345",\
+"region":"my_region","streetLine1":"1 rue mon adresse",\
+"streetLine2":"Appt 1"},\"birthDate":[1980,1,1],"firstName":"John",\
+"lastName":"Doe","phone":"+33612345678","email":"myemail@email.com",\
+"emailVerified":false,"state":"ACTIVE","referralCode":"refcode",\
+"kyc":"PASSED","termsVersion":"2018-05-25","underReview":false,\
+"riskAssessed":false,"locale":"en-GB"},"wallet":{"id":"wallet_id",\
+"ref":"12345678","state":"ACTIVE","baseCurrency":"EUR",\
+"topupLimit":3000000,"totalTopup":0,"topupResetDate":123456789,\
+"pockets":[{"id":"pocket_id","type":"CURRENT","state":"ACTIVE",\
+"currency":"EUR","balance":100,"blockedAmount":0,"closed":false,\
+"creditLimit":0}]},"accessToken":"myaccesstoken"}')
+
 _AVAILABLE_CURRENCIES = ["USD", "RON", "HUF", "CZK", "GBP", "CAD", "THB",
                          "SGD", "CHF", "AUD", "ILS", "DKK", "PLN", "MAD",
                          "AED", "EUR", "JPY", "ZAR", "NZD", "HKD", "TRY",
@@ -28,6 +107,8 @@ _AVAILABLE_CURRENCIES = ["USD", "RON", "HUF", "CZK", "GBP", "CAD", "THB",
                          "LTC", "SAR", "RUB", "RSD", "MXN", "ISK", "HRK",
                          "BGN", "XAU", "XAG", "IDR", "INR", "MYR", "PHP", 
                          "XLM"]
+_CURRENCIES = frozenset(_AVAILABLE_CURRENCIES)  # For fast lookups
+_CRYPTO_CURRENCIES = frozenset(["BTC", "ETH", "BCH", "XRP", "LTC"])
 
 
 
@@ -40,6 +121,12 @@ _TRANSACTION_PENDING = "PENDING"
 _TRANSACTION_REVERTED = "REVERTED"
 _TRANSACTION_DECLINED = "DECLINED"
 
+# Transactions started before the last sync may still change state
+# (PENDING => COMPLETED), so they are fetched again during this window
+_DEFAULT_SYNC_OVERLAP = timedelta(days=7)
+# Size of the time windows downloaded concurrently during a backfill
+_DEFAULT_BACKFILL_WINDOW = timedelta(days=30)
+
 
 # The amounts are stored as integer on Revolut.
 # They apply a scale factor depending on the currency
@@ -55,31 +142,90 @@ _SCALE_FACTOR_CURRENCY_DICT = {
 
 
 class Amount:
-    """ Class to handle the Revolut amount with currencies """
+    """ Class to handle the Revolut amount with currencies.
+    The amounts of the same currency can be compared, added and subtracted,
+    with integer operations on the Revolut amounts.
+    Setting revolut_amount, real_amount or real_amount_str updates the
+    other ones (so the amounts are not hashable)
+    >>> amount = Amount(revolut_amount=100, currency="EUR")
+    >>> amount.real_amount = 2.5
+    >>> amount.revolut_amount, amount.real_amount_str
+    (250, '2.50')
+    >>> amount.real_amount_str = "3"
+    >>> amount.revolut_amount, amount.real_amount, str(amount)
+    (300, 3.0, '3.00 EUR')
+    >>> amount.revolut_amount = 5
+    >>> amount.real_amount, str(amount)
+    (0.05, '0.05 EUR')
+    >>> {amount}
+    Traceback (most recent call last):
+    ...
+    TypeError: unhashable type: 'Amount'
+    """
+    __slots__ = ("currency", "_revolut_amount", "_real_amount",
+                 "_real_amount_str")
+
     def __init__(self, currency, revolut_amount=None, real_amount=None):
-        if currency not in _AVAILABLE_CURRENCIES:
+        if currency not in _CURRENCIES:
             raise KeyError(currency)
         self.currency = currency
 
         if revolut_amount is not None:
             if type(revolut_amount) != int:
                 raise TypeError(type(revolut_amount))
-            self.revolut_amount = revolut_amount
-            self.real_amount = self.get_real_amount()
+            self._revolut_amount = revolut_amount
+            self._real_amount = None  # Computed when needed
 
         elif real_amount is not None:
             if type(real_amount) not in [float, int]:
                 raise TypeError(type(real_amount))
-            self.real_amount = float(real_amount)
-            self.revolut_amount = self.get_revolut_amount()
+            self._real_amount = float(real_amount)
+            self._revolut_amount = self.get_revolut_amount()
         else:
             raise ValueError("revolut_amount or real_amount must be set")
 
-        self.real_amount_str = self.get_real_amount_str()
+        self._real_amount_str = None  # Formatted when needed
+
+    @property
+    def revolut_amount(self):
+        return self._revolut_amount
+
+    @revolut_amount.setter
+    def revolut_amount(self, revolut_amount):
+        if type(revolut_amount) != int:
+            raise TypeError(type(revolut_amount))
+        self._revolut_amount = revolut_amount
+        self._real_amount = None
+        self._real_amount_str = None
+
+    @property
+    def real_amount(self):
+        if self._real_amount is None:
+            self._real_amount = self.get_real_amount()
+        return self._real_amount
+
+    @real_amount.setter
+    def real_amount(self, real_amount):
+        if type(real_amount) not in [float, int]:
+            raise TypeError(type(real_amount))
+        self._real_amount = float(real_amount)
+        self._revolut_amount = self.get_revolut_amount()
+        self._real_amount_str = None
+
+    @property
+    def real_amount_str(self):
+        if self._real_amount_str is None:
+            self._real_amount_str = self.get_real_amount_str()
+        return self._real_amount_str
+
+    @real_amount_str.setter
+    def real_amount_str(self, real_amount_str):
+        # Formatted again, like the other amounts of the currency
+        self.real_amount = float(real_amount_str)
 
     def get_real_amount_str(self):
         """ Get the real amount with the proper format, without currency """
-        if self.currency in ["BTC", "ETH", "BCH", "XRP", "LTC"]:
+        if self.currency in _CRYPTO_CURRENCIES:
             digits_after_float = 8
         else:
             digits_after_float = 2
@@ -93,6 +239,76 @@ class Amount:
         return("Amount(real_amount={}, currency='{}')".format(
             self.real_amount, self.currency))
 
+    def _check_same_currency(self, other):
+        if self.currency != other.currency:
+            raise ValueError("Currencies are different : {} and {}".format(
+                self.currency, other.currency))
+
+    def __eq__(self, other):
+        """
+        >>> Amount(real_amount=1, currency="EUR") == \
+        Amount(revolut_amount=100, currency="EUR")
+        True
+        """
+        if type(other) != Amount:
+            return NotImplemented
+        return self.currency == other.currency and \
+            self._revolut_amount == other._revolut_amount
+
+    # Not hashable, because an amount can be modified : use
+    # (currency, revolut_amount) as the key of a dict or a set
+    __hash__ = None
+
+    def __lt__(self, other):
+        """
+        >>> Amount(real_amount=1, currency="EUR") < \
+        Amount(real_amount=1.01, currency="EUR")
+        True
+        """
+        if type(other) != Amount:
+            return NotImplemented
+        self._check_same_currency(other)
+        return self._revolut_amount < other._revolut_amount
+
+    def __le__(self, other):
+        if type(other) != Amount:
+            return NotImplemented
+        self._check_same_currency(other)
+        return self._revolut_amount <= other._revolut_amount
+
+    def __gt__(self, other):
+        if type(other) != Amount:
+            return NotImplemented
+        self._check_same_currency(other)
+        return self._revolut_amount > other._revolut_amount
+
+    def __ge__(self, other):
+        if type(other) != Amount:
+            return NotImplemented
+        self._check_same_currency(other)
+        return self._revolut_amount >= other._revolut_amount
+
+    def __add__(self, other):
+        """
+        >>> print(Amount(real_amount=1.5, currency="EUR") + \
+        Amount(real_amount=2.25, currency="EUR"))
+        3.75 EUR
+        """
+        if type(other) != Amount:
+            return NotImplemented
+        self._check_same_currency(other)
+        return Amount(
+            revolut_amount=self._revolut_amount + other._revolut_amount,
+            currency=self.currency)
+
+    def __sub__(self, other):
+        if type(other) != Amount:
+            return NotImplemented
+        self._check_same_currency(other)
+        return Amount(
+            revolut_amount=self._revolut_amount - other._revolut_amount,
+            currency=self.currency)
+
     def get_real_amount(self):
         """ Get the real amount from a Revolut amount
         >>> a = Amount(revolut_amount=100, currency="EUR")
@@ -108,10 +324,14 @@ class Amount:
         >>> a = Amount(real_amount=1, currency="EUR")
         >>> a.get_revolut_amount()
         100
+        >>> a = Amount(real_amount=8.66, currency="EUR")
+        >>> a.get_revolut_amount()
+        866
         """
         scale = _SCALE_FACTOR_CURRENCY_DICT.get(
                 self.currency, _DEFAULT_SCALE_FACTOR)
-        return int(self.real_amount*scale)
+        # round, because 8.66*100 = 865.9999999999999
+        return int(round(self.real_amount*scale))
 
 
 class Transaction:
@@ -133,62 +353,603 @@ class Transaction:
                                       self.to_amount))
 
 
+def _get_headers(token, device_id):
+    return {
+        'Host': 'api.revolut.com',
+        'X-Api-Version': '1',
+        'X-Client-Version': '6.34.3',
+        'X-Device-Id': device_id,
+        'User-Agent': 'Revolut/5.5 500500250 (CLI; Android 4.4.2)',
+        'Authorization': 'Basic '+token,
+    }
+
+
+def _replace_api_base(url, api_base):
+    """ Send the request to another server than API_BASE (ex : for tests)
+    >>> _replace_api_base(_URL_EXCHANGE, "http://127.0.0.1:8080")
+    'http://127.0.0.1:8080/exchange'
+    """
+    if api_base != API_BASE and url.startswith(API_BASE):
+        url = api_base + url[len(API_BASE):]
+    return url
+
+
 class Client:
-    """ Do the requests with the Revolut servers """
-    def __init__(self, token, device_id):
+    """ Do the requests with the Revolut servers
+    - pool_size : maximum number of connections kept open (per host)
+    - keep_alive : reuse the connections between requests
+    - timeout : (connect, read) timeouts in seconds (tuple or list),
+    or a single timeout for both
+    - max_retries : number of retries of a GET request which failed with
+    a connection error, a timeout or a status code 429/5xx.
+    The delay between the retries is exponential (backoff_factor * 2^retry,
+    up to backoff_max seconds) with jitter, or given by the 'Retry-After'
+    header. POST requests (ex : /exchange) are never retried
+    - cached_endpoints : paths (ex : ["/user/current/wallet"]) of the
+    responses kept in a ResponseCache of response_cache_size urls, and
+    requested again with their 'ETag' / 'Last-Modified' validators
+    - json_loads : function decoding the JSON responses from bytes
+    (orjson.loads when orjson is installed, else json.loads)
+    - metrics : RequestMetrics recording the requests, by endpoint
+    - on_request, on_response : functions called before and after each
+    request (each retry is a request) :
+    on_request(method, endpoint, url)
+    on_response(method, endpoint, url, response, seconds, exception)
+    with response None if the request raised exception """
+    def __init__(
+        self,
+        token,
+        device_id,
+        api_base=API_BASE,
+        pool_size=_DEFAULT_POOL_SIZE,
+        keep_alive=True,
+        timeout=_DEFAULT_TIMEOUT,
+        max_retries=_DEFAULT_MAX_RETRIES,
+        backoff_factor=_DEFAULT_BACKOFF_FACTOR,
+        backoff_max=_DEFAULT_BACKOFF_MAX,
+        cached_endpoints=(),
+        response_cache_size=_DEFAULT_RESPONSE_CACHE_SIZE,
+        json_loads=_DEFAULT_JSON_LOADS,
+        metrics=None,
+        on_request=None,
+        on_response=None,
+    ):
+        self.api_base = api_base
+        self.json_loads = json_loads
+        self.metrics = metrics
+        self.on_request = on_request
+        self.on_response = on_response
+        self.cached_endpoints = tuple(cached_endpoints)
+        self.response_cache = ResponseCache(maxsize=response_cache_size)
+        # A list (ex : read from a YAML config) is not accepted by requests
+        self.timeout = tuple(timeout) if isinstance(timeout, (list, tuple)) \
+            else timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
         self.session = requests.session()
-        self.session.headers = {
-                    'Host': 'api.revolut.com',
-                    'X-Api-Version': '1',
-                    'X-Client-Version': '6.34.3',
-                    'X-Device-Id': device_id,
-                    'User-Agent': 'Revolut/5.5 500500250 (CLI; Android 4.4.2)',
-                    'Authorization': 'Basic '+token,
-                    }
-
-    def _get(self, url, *, expected_status_code=200, **kwargs):
-        ret = self.session.get(url=url, **kwargs)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                                pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers = _get_headers(token=token, device_id=device_id)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def _get(self, url, *, expected_status_code=200, retry=True, **kwargs):
+        url = _replace_api_base(url, self.api_base)
+        ret = self._request(self.session.get, url, retry=retry, **kwargs)
         if ret.status_code != expected_status_code:
             raise ConnectionError(
                 'Status code {} for url {}\n{}'.format(
                     ret.status_code, url, ret.text))
         return ret
 
+    def _get_json(self, url, *, retry=True, **kwargs):
+        """ Get the parsed JSON response of a GET request.
+        The responses of the cached_endpoints are kept : they are returned
+        without downloading them again when the server answers
+        '304 Not Modified', and without parsing them again when the body did
+        not change. So the returned objects must not be modified """
+        url = _replace_api_base(url, self.api_base)
+        if not self._is_cached(url):
+            return self._parse_json(self._get(url, retry=retry, **kwargs))
+
+        cache_key = (url, tuple(sorted((kwargs.get('params') or {}).items())))
+        cached = self.response_cache.get(cache_key)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        ret = self._request(self.session.get, url, retry=retry,
+                            headers=headers, **kwargs)
+        if ret.status_code == 304 and cached is not None:
+            self.response_cache.count('not_modified')
+            return cached.data
+        if ret.status_code != 200:
+            raise ConnectionError(
+                'Status code {} for url {}\n{}'.format(
+                    ret.status_code, url, ret.text))
+
+        digest = hashlib.sha1(ret.content).digest()
+        if cached is not None and cached.digest == digest:
+            self.response_cache.count('unchanged')
+            data = cached.data
+        else:
+            data = self._parse_json(ret)
+        self.response_cache.set(cache_key, _CachedResponse(
+            etag=ret.headers.get('ETag'),
+            last_modified=ret.headers.get('Last-Modified'),
+            digest=digest,
+            data=data))
+        return data
+
+    def _parse_json(self, ret):
+        return self.json_loads(ret.content)
+
+    def _is_cached(self, url):
+        if not self.cached_endpoints or not url.startswith(self.api_base):
+            return False
+        path = urlparse(url[len(self.api_base):]).path
+        return path.startswith(self.cached_endpoints)
+
     def _post(self, url, *, expected_status_code=200, **kwargs):
-        ret = self.session.post(url=url, **kwargs)
+        url = _replace_api_base(url, self.api_base)
+        ret = self._request(self.session.post, url, retry=False, **kwargs)
         if ret.status_code != expected_status_code:
             raise ConnectionError(
                 'Status code {} for url {}\n{}'.format(
                     ret.status_code, url, ret.text))
         return ret
 
+    def _request(self, method, url, retry, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        # Nothing is measured without metrics or hooks
+        observed = self.metrics is not None or \
+            self.on_request is not None or self.on_response is not None
+        retry_number = 0
+        while True:
+            try:
+                if observed:
+                    ret = self._observed_request(method, url, **kwargs)
+                else:
+                    ret = method(url=url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not retry or retry_number >= self.max_retries:
+                    raise
+                delay = self._get_retry_delay(retry_number)
+            else:
+                if not retry or retry_number >= self.max_retries or \
+                        ret.status_code not in _RETRY_STATUS_CODES:
+                    return ret
+                delay = self._get_retry_delay(
+                    retry_number, ret.headers.get('Retry-After'))
+                if delay is None:
+                    return ret
+            time.sleep(delay)
+            retry_number += 1
+
+    def _observed_request(self, method, url, **kwargs):
+        http_method = method.__name__.upper()
+        endpoint = _get_endpoint(url, self.api_base)
+        if self.on_request is not None:
+            self.on_request(http_method, endpoint, url)
+        start = time.perf_counter()
+        try:
+            ret = method(url=url, **kwargs)
+        except Exception as e:
+            self._on_response(http_method, endpoint, url, None,
+                              time.perf_counter() - start, e)
+            raise
+        self._on_response(http_method, endpoint, url, ret,
+                          time.perf_counter() - start, None)
+        return ret
+
+    def _on_response(self, http_method, endpoint, url, ret, seconds,
+                     exception):
+        if self.metrics is not None:
+            if ret is None:
+                status, sent_bytes, received_bytes = \
+                    type(exception).__name__, 0, 0
+            else:
+                status = ret.status_code
+                body = ret.request.body if ret.request is not None else None
+                sent_bytes = len(body) if body else 0
+                received_bytes = len(ret.content or b"")
+            self.metrics.observe(http_method, endpoint, status, seconds,
+                                 sent_bytes=sent_bytes,
+                                 received_bytes=received_bytes)
+        if self.on_response is not None:
+            self.on_response(http_method, endpoint, url, ret, seconds,
+                             exception)
+
+    def _get_retry_delay(self, retry_number, retry_after=None):
+        """ Delay in seconds before the next retry, or None if the server
+        asks to wait longer than backoff_max """
+        if retry_after is not None:
+            delay = _parse_retry_after(retry_after)
+            if delay is not None:
+                return delay if delay <= self.backoff_max else None
+        # "Full jitter", so that the clients do not retry all together
+        return random.uniform(0, min(
+            self.backoff_max, self.backoff_factor * 2 ** retry_number))
+
+
+def _parse_retry_after(retry_after):
+    """ Get the delay in seconds of a 'Retry-After' header
+    >>> _parse_retry_after("120")
+    120.0
+    >>> _parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT")
+    0.0
+    >>> _parse_retry_after("unknown") is None
+    True
+    """
+    try:
+        return max(0., float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_date = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0., retry_date.timestamp() - time.time())
+
+
+def _get_endpoint(url, api_base=API_BASE):
+    """ Get the endpoint of a url, for the metrics
+    >>> _get_endpoint(_URL_QUOTE + "EURBTC?amount=100&side=SELL")
+    '/quote/{pair}'
+    >>> _get_endpoint("http://127.0.0.1:8080/user/current/wallet",
+    ...               "http://127.0.0.1:8080")
+    '/user/current/wallet'
+    """
+    path = urlparse(url).path
+    base_path = urlparse(api_base).path.rstrip("/")
+    if base_path and path.startswith(base_path):
+        path = path[len(base_path):]
+    for prefix, endpoint in _ENDPOINT_PREFIXES:
+        if path.startswith(prefix):
+            return endpoint
+    return path
+
+
+class RequestMetrics:
+    """ Counters of the requests (by method, endpoint and status),
+    of the bytes sent and received, and histograms of the latencies of the
+    successful and failed requests (status >= 400 or exception).
+    to_prometheus() renders them in the Prometheus text format """
+    def __init__(self, buckets=_DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # (method, endpoint, status) => number of requests
+            self.requests = {}
+            # (method, endpoint, "sent" or "received") => number of bytes
+            self.bytes = {}
+            # (method, endpoint, "success" or "error") =>
+            # [count of each bucket (+ one above the last), sum, count]
+            self.latencies = {}
+
+    def observe(self, method, endpoint, status, seconds, sent_bytes=0,
+                received_bytes=0):
+        """ Record a request. status is the status code,
+        or the exception name if no response was received """
+        outcome = "success" if isinstance(status, int) and status < 400 \
+            else "error"
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            key = (method, endpoint, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for direction, size in [("sent", sent_bytes),
+                                    ("received", received_bytes)]:
+                key = (method, endpoint, direction)
+                self.bytes[key] = self.bytes.get(key, 0) + size
+            latency = self.latencies.get((method, endpoint, outcome))
+            if latency is None:
+                latency = [0] * (len(self.buckets) + 1) + [0., 0]
+                self.latencies[(method, endpoint, outcome)] = latency
+            latency[bucket] += 1
+            latency[-2] += seconds
+            latency[-1] += 1
+
+    def to_prometheus(self, prefix="revolut"):
+        """ Get a snapshot of the metrics, in the Prometheus text format
+        >>> metrics = RequestMetrics(buckets=[0.1, 1])
+        >>> metrics.observe("GET", "/quote/{pair}", 200, 0.05,
+        ...                 received_bytes=120)
+        >>> print(metrics.to_prometheus())  # doctest: +ELLIPSIS
+        # HELP revolut_requests_total Requests sent to the Revolut API
+        # TYPE revolut_requests_total counter
+        revolut_requests_total{method="GET",endpoint="/quote/{pair}",\
+status="200"} 1
+        ...
+        revolut_request_duration_seconds_bucket{method="GET",\
+endpoint="/quote/{pair}",outcome="success",le="0.1"} 1
+        ...
+        """
+        with self._lock:
+            requests_items = sorted(self.requests.items())
+            bytes_items = sorted(self.bytes.items())
+            latencies_items = sorted(
+                (key, list(latency))
+                for key, latency in self.latencies.items())
+        lines = [
+            "# HELP {}_requests_total Requests sent to the Revolut API"
+            .format(prefix),
+            "# TYPE {}_requests_total counter".format(prefix),
+        ]
+        for (method, endpoint, status), count in requests_items:
+            lines.append("{}_requests_total{} {}".format(prefix, _labels(
+                method=method, endpoint=endpoint, status=status), count))
+        lines.extend([
+            "# HELP {}_request_bytes_total Bytes sent and received"
+            .format(prefix),
+            "# TYPE {}_request_bytes_total counter".format(prefix),
+        ])
+        for (method, endpoint, direction), size in bytes_items:
+            lines.append("{}_request_bytes_total{} {}".format(
+                prefix, _labels(method=method, endpoint=endpoint,
+                                direction=direction), size))
+        lines.extend([
+            "# HELP {}_request_duration_seconds Latency of the requests"
+            .format(prefix),
+            "# TYPE {}_request_duration_seconds histogram".format(prefix),
+        ])
+        for (method, endpoint, outcome), latency in latencies_items:
+            cumulative_count = 0
+            for upper_bound, count in zip(
+                    list(self.buckets) + ["+Inf"], latency):
+                cumulative_count += count
+                lines.append("{}_request_duration_seconds_bucket{} {}".format(
+                    prefix, _labels(method=method, endpoint=endpoint,
+                                    outcome=outcome, le=upper_bound),
+                    cumulative_count))
+            labels = _labels(method=method, endpoint=endpoint,
+                             outcome=outcome)
+            lines.append("{}_request_duration_seconds_sum{} {}".format(
+                prefix, labels, latency[-2]))
+            lines.append("{}_request_duration_seconds_count{} {}".format(
+                prefix, labels, latency[-1]))
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    return "{" + ",".join('{}="{}"'.format(
+        name, str(value).replace("\\", "\\\\").replace('"', '\\"')
+        .replace("\n", "\\n"))
+        for name, value in labels.items()) + "}"
+
+
+def get_percentile(sorted_values, percent):
+    """ Get the percentile of sorted values (nearest rank)
+    >>> get_percentile([1, 2, 3, 4], 50)
+    2
+    >>> get_percentile([1, 2, 3, 4], 99)
+    4
+    >>> get_percentile([], 50) is None
+    True
+    """
+    if not sorted_values:
+        return None
+    rank = -(-len(sorted_values) * percent // 100)  # Rounded up
+    return sorted_values[max(0, int(rank) - 1)]
+
+
+_CachedResponse = namedtuple(
+    "_CachedResponse", ["etag", "last_modified", "digest", "data"])
+
+
+class ResponseCache:
+    """ Cache of the parsed responses by url, with their validators
+    ('ETag', 'Last-Modified') and the hash of their body.
+    Only the maxsize most recently used urls are kept.
+    The counters tell how many responses were not downloaded
+    ('304 Not Modified') or not parsed (same body) again """
+    def __init__(self, maxsize=_DEFAULT_RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.not_modified = 0
+        self.unchanged = 0
+        self.misses = 0
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._responses)
+
+    def get(self, key):
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is None:
+                self.misses += 1
+            else:
+                self._responses.move_to_end(key)
+            return cached
+
+    def set(self, key, cached):
+        with self._lock:
+            self._responses[key] = cached
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.maxsize:
+                self._responses.popitem(last=False)
+
+    def count(self, counter):
+        """ Increment the 'not_modified' or 'unchanged' counter """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+
+    def stats(self):
+        return {
+            "not_modified": self.not_modified,
+            "unchanged": self.unchanged,
+            "misses": self.misses,
+            "size": len(self._responses),
+        }
+
+
+class QuoteCache:
+    """ Cache of the quote rates by currency pair (ex : EUR => BTC).
+    During ttl seconds, the quotes of a pair are derived from its last rate,
+    whatever the amount. Only the maxsize most recently used pairs are kept.
+    The hits and misses counters help to choose the ttl """
+    def __init__(self, ttl=_DEFAULT_QUOTE_CACHE_TTL,
+                 maxsize=_DEFAULT_QUOTE_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._rates = OrderedDict()  # (from, to) => (rate, monotonic time)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rates)
+
+    def get(self, from_amount, to_currency):
+        """ Get the quote derived from the cached rate,
+        or None if the pair is unknown or expired
+        >>> cache = QuoteCache(ttl=60)
+        >>> cache.set(Amount(real_amount=10, currency="EUR"),
+        ...           Amount(real_amount=11.5, currency="USD"))
+        >>> print(cache.get(Amount(real_amount=2, currency="EUR"), "USD"))
+        2.30 USD
+        >>> cache.get(Amount(real_amount=2, currency="EUR"), "BTC") is None
+        True
+        """
+        key = (from_amount.currency, to_currency)
+        with self._lock:
+            cached = self._rates.get(key)
+            if cached is None or time.monotonic() - cached[1] >= self.ttl:
+                self.misses += 1
+                return None
+            self._rates.move_to_end(key)
+            self.hits += 1
+        rate = cached[0]
+        return Amount(revolut_amount=round(from_amount.revolut_amount * rate),
+                      currency=to_currency)
+
+    def set(self, from_amount, to_amount):
+        if not from_amount.revolut_amount:
+            return  # No rate can be computed
+        key = (from_amount.currency, to_amount.currency)
+        rate = to_amount.revolut_amount / from_amount.revolut_amount
+        with self._lock:
+            self._rates[key] = (rate, time.monotonic())
+            self._rates.move_to_end(key)
+            while len(self._rates) > self.maxsize:
+                self._rates.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._rates.clear()
+
+    def stats(self):
+        requests_nb = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests_nb if requests_nb else 0.,
+            "size": len(self._rates),
+        }
+
 
 class Revolut:
-    def __init__(self, token, device_id):
-        self.client = Client(token=token, device_id=device_id)
+    def __init__(self, token, device_id, api_base=API_BASE, quote_cache=None,
+                 wallet_cache_ttl=_DEFAULT_WALLET_CACHE_TTL,
+                 **client_options):
+        """ quote_cache is an optional QuoteCache, to limit the quote requests
+        wallet_cache_ttl is the time (in seconds) during which the wallet is
+        not downloaded again (0, the default, to disable the cache)
+        client_options are passed to Client
+        (pool_size, keep_alive, timeout, max_retries...) """
+        self.client = Client(token=token, device_id=device_id,
+                             api_base=api_base, **client_options)
+        self.quote_cache = quote_cache
+        self.wallet_cache_ttl = wallet_cache_ttl
+        self._wallet = None  # (raw wallet, monotonic time)
+        self._wallet_lock = threading.Lock()
+
+    def get_wallet(self, refresh=False):
+        """ Get the /user/current/wallet response (dict), downloaded again
+        only if it is older than wallet_cache_ttl, or to refresh it.
+        With the cache, the same dict is returned to all the callers :
+        don't modify it (or copy it first) """
+        if self.wallet_cache_ttl <= 0:
+            # No cache : the concurrent requests are not serialized
+            return self.client._get_json(_URL_GET_ACCOUNTS)
+        with self._wallet_lock:
+            if refresh or self._wallet is None or \
+                    time.monotonic() - self._wallet[1] >= \
+                    self.wallet_cache_ttl:
+                self._wallet = (self.client._get_json(_URL_GET_ACCOUNTS),
+                                time.monotonic())
+            return self._wallet[0]
+
+    def invalidate_wallet(self):
+        """ Forget the cached wallet (ex : the balances changed) """
+        with self._wallet_lock:
+            self._wallet = None
 
     def get_account_balances(self):
         """ Get the account balance for each currency
         and returns it as a dict {"balance":XXXX, "currency":XXXX} """
-        ret = self.client._get(_URL_GET_ACCOUNTS)
-        raw_accounts = ret.json()
-
-        account_balances = []
-        for raw_account in raw_accounts.get("pockets"):
-            account_balances.append({
-                "balance": raw_account.get("balance"),
-                "currency": raw_account.get("currency"),
-                "type": raw_account.get("type"),
-                "state": raw_account.get("state"),
-                # name is present when the account is a vault (type = SAVINGS)
-                "vault_name": raw_account.get("name", ""),
-            })
-        self.account_balances = Accounts(account_balances)
+        self.account_balances = _accounts_from_raw_wallet(self.get_wallet())
         return self.account_balances
 
-    def get_account_transactions(self, from_date=None, to_date=None):
-        """Get the account transactions."""
-        raw_transactions = []
+    def get_account_transactions(self, from_date=None, to_date=None,
+                                 workers=1, window=_DEFAULT_BACKFILL_WINDOW):
+        """Get the account transactions.
+        With several workers (and a from_date), [from_date, to_date] is
+        split into time windows of the given size (timedelta), which are
+        downloaded concurrently """
+        if workers > 1 and from_date:
+            raw_transactions = self._get_raw_transactions_by_window(
+                from_date=from_date, to_date=to_date,
+                workers=workers, window=window)
+        else:
+            raw_transactions = list(self.iter_raw_account_transactions(
+                from_date=from_date, to_date=to_date))
+        return AccountTransactions(raw_transactions)
+
+    def _get_raw_transactions_by_window(self, from_date, to_date,
+                                        workers, window):
+        windows = []  # Most recent first, like the API
+        window_to = to_date or datetime.now()
+        while window_to > from_date:
+            window_from = max(window_to - window, from_date)
+            windows.append((window_from, window_to))
+            window_to = window_from
+        if windows and to_date is None:
+            # Like the sequential path, no 'to' for the newest window (so
+            # the transactions started during the last second are received)
+            windows[0] = (windows[0][0], None)
+
+        def get_window(dates):
+            return list(self.iter_raw_account_transactions(
+                from_date=dates[0], to_date=dates[1]))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            window_transactions = executor.map(get_window, windows)
+            # A transaction on the limit of 2 windows may be received twice
+            raw_transactions_by_id = {}
+            for raw_transactions in window_transactions:
+                for raw_transaction in raw_transactions:
+                    raw_transactions_by_id.setdefault(
+                        raw_transaction['id'], raw_transaction)
+
+        return sorted(raw_transactions_by_id.values(),
+                      key=lambda t: -t['startedDate'])
+
+    def iter_raw_account_transactions(self, from_date=None, to_date=None):
+        """ Yield the raw account transactions (dict), most recent first,
+        page by page as they are received from the API """
         params = {}
         if to_date:
             params['to'] = int(to_date.timestamp()) * 1000
@@ -196,92 +957,185 @@ class Revolut:
             params['from'] = int(from_date.timestamp()) * 1000
 
         while True:
-            ret = self.client._get(_URL_GET_TRANSACTIONS_LAST, params=params)
-            ret_transactions = ret.json()
+            ret_transactions = self.client._get_json(
+                _URL_GET_TRANSACTIONS_LAST, params=params)
             if not ret_transactions:
                 break
             params['to'] = ret_transactions[-1]['startedDate']
-            raw_transactions.extend(ret_transactions)
-        
-        return AccountTransactions(raw_transactions)
+            yield from ret_transactions
+
+    def iter_account_transactions(self, from_date=None, to_date=None):
+        """ Yield the account transactions (AccountTransaction objects),
+        without keeping the whole history in memory """
+        for raw_transaction in self.iter_raw_account_transactions(
+                from_date=from_date, to_date=to_date):
+            yield _account_transaction_from_raw(raw_transaction)
+
+    def sync_account_transactions(self, store, from_date=None,
+                                  overlap=_DEFAULT_SYNC_OVERLAP):
+        """ Fetch the account transactions into a TransactionStore
+        (see revolut.store), incrementally.
+        Only the transactions newer than the last synced 'startedDate'
+        (minus an overlap, to catch the PENDING => COMPLETED updates)
+        are downloaded, unless from_date is older than what was synced.
+        Returns the number of transactions fetched """
+        synced_from = store.synced_from()
+        last_started_date = store.last_started_date()
+        # 0 means the whole history
+        from_timestamp = int(from_date.timestamp()) * 1000 if from_date else 0
+        incremental = last_started_date is not None and \
+            synced_from is not None and from_timestamp >= synced_from
+
+        if incremental:
+            sync_from_date = datetime.fromtimestamp(
+                last_started_date / 1000) - overlap
+        else:
+            sync_from_date = from_date
+
+        raw_transactions = list(self.iter_raw_account_transactions(
+            from_date=sync_from_date))
+        store.upsert(raw_transactions)
+        if not incremental:
+            store.set_synced_from(from_timestamp)
+        return len(raw_transactions)
 
     def get_wallet_id(self):
         """ Get the main wallet_id """
-        ret = self.client._get(_URL_GET_ACCOUNTS)
-        raw = ret.json()
-        return raw.get('id')
+        return self.get_wallet().get('id')
+
+    def get_pockets(self):
+        """ Get the pockets of the wallet (list of dicts with their id,
+        type, state, currency, balance...).
+        Like get_wallet, the list of the cached wallet is returned :
+        don't modify it """
+        return self.get_wallet().get('pockets')
 
     def quote(self, from_amount, to_currency):
-        if type(from_amount) != Amount:
-            raise TypeError("from_amount must be with the Amount type")
-
-        if to_currency not in _AVAILABLE_CURRENCIES:
-            raise KeyError(to_currency)
-
-        url_quote = urljoin(_URL_QUOTE, '{}{}?amount={}&side=SELL'.format(
-            from_amount.currency,
-            to_currency,
-            from_amount.revolut_amount))
-        ret = self.client._get(url_quote)
-        raw_quote = ret.json()
-        quote_obj = Amount(revolut_amount=raw_quote["to"]["amount"],
-                           currency=to_currency)
+        url_quote = _get_quote_url(from_amount, to_currency)
+        if self.quote_cache is not None:
+            quote_obj = self.quote_cache.get(from_amount, to_currency)
+            if quote_obj is not None:
+                return quote_obj
+
+        quote_obj = _amount_from_raw_quote(
+            self.client._get_json(url_quote), to_currency)
+        if self.quote_cache is not None:
+            self.quote_cache.set(from_amount, quote_obj)
         return quote_obj
 
-    def exchange(self, from_amount, to_currency, simulate=False):
-        if type(from_amount) != Amount:
-            raise TypeError("from_amount must be with the Amount type")
-
-        if to_currency not in _AVAILABLE_CURRENCIES:
-            raise KeyError(to_currency)
+    def quote_many(self, quote_requests, workers=_DEFAULT_QUOTE_WORKERS):
+        """ Get the quotes of a list of (from_amount, to_currency)
+        concurrently, with identical requests done only once.
+        Returns a list in the same order as quote_requests, with for each
+        request the quote (Amount), or the exception raised to get it """
+        def get_quote(quote_request):
+            try:
+                return self.quote(*quote_request)
+            except Exception as e:
+                return e
+
+        def get_key(quote_request):
+            try:
+                from_amount, to_currency = quote_request
+                if type(from_amount) == Amount:
+                    key = (from_amount.currency, from_amount.revolut_amount,
+                           to_currency)
+                    hash(key)
+                    return key
+            except Exception:
+                pass
+            # Not merged : get_quote will return the error of this request
+            return id(quote_request)
+
+        unique_requests = {}
+        for quote_request in quote_requests:
+            unique_requests.setdefault(get_key(quote_request), quote_request)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            quotes = dict(zip(unique_requests, executor.map(
+                get_quote, unique_requests.values())))
+        return [quotes[get_key(quote_request)]
+                for quote_request in quote_requests]
 
-        data = {
-            "fromCcy": from_amount.currency,
-            "fromAmount": from_amount.revolut_amount,
-            "toCcy": to_currency,
-            "toAmount": None,
-        }
+    def exchange(self, from_amount, to_currency, simulate=False):
+        data = _get_exchange_data(from_amount, to_currency)
 
         if simulate:
             # Because we don't want to exchange currencies
             # for every test ;)
-            simu = '[{"account":{"id":"FAKE_ID"},\
-            "amount":-1,"balance":0,"completedDate":123456789,\
-            "counterpart":{"account":\
-            {"id":"FAKE_ID"},\
-            "amount":170,"currency":"BTC"},"currency":"EUR",\
-            "description":"Exchanged to BTC","direction":"sell",\
-            "fee":0,"id":"FAKE_ID",\
-            "legId":"FAKE_ID","rate":0.0001751234,\
-            "startedDate":123456789,"state":"COMPLETED","type":"EXCHANGE",\
-            "updatedDate":123456789},\
-            {"account":{"id":"FAKE_ID"},"amount":170,\
-            "balance":12345,"completedDate":12345678,"counterpart":\
-            {"account":{"id":"FAKE_ID"},\
-            "amount":-1,"currency":"EUR"},"currency":"BTC",\
-            "description":"Exchanged from EUR","direction":"buy","fee":0,\
-            "id":"FAKE_ID",\
-            "legId":"FAKE_ID",\
-            "rate":5700.0012345,"startedDate":123456789,\
-            "state":"COMPLETED","type":"EXCHANGE",\
-            "updatedDate":123456789}]'
-            raw_exchange = json.loads(simu)
-        else:
-            ret = self.client._post(_URL_EXCHANGE, json=data)
-            raw_exchange = ret.json()
-
-        if raw_exchange[0]["state"] == "COMPLETED":
-            amount = raw_exchange[0]["counterpart"]["amount"]
-            currency = raw_exchange[0]["counterpart"]["currency"]
-            exchanged_amount = Amount(revolut_amount=amount,
-                                      currency=currency)
-            exchange_transaction = Transaction(from_amount=from_amount,
-                                               to_amount=exchanged_amount,
-                                               date=datetime.now())
+            raw_exchange = _SIMU_EXCHANGE
         else:
-            raise ConnectionError("Transaction error : %s" % ret.text)
+            try:
+                ret = self.client._post(_URL_EXCHANGE, json=data)
+            finally:
+                # The balances changed (or may have changed)
+                self.invalidate_wallet()
+            raw_exchange = self.client._parse_json(ret)
+
+        return _transaction_from_raw_exchange(raw_exchange, from_amount)
+
+
+def _accounts_from_raw_wallet(raw_wallet):
+    """ Build an Accounts object from the /user/current/wallet response """
+    account_balances = []
+    for raw_account in raw_wallet.get("pockets"):
+        account_balances.append({
+            "balance": raw_account.get("balance"),
+            "currency": raw_account.get("currency"),
+            "type": raw_account.get("type"),
+            "state": raw_account.get("state"),
+            # name is present when the account is a vault (type = SAVINGS)
+            "vault_name": raw_account.get("name", ""),
+        })
+    return Accounts(account_balances)
+
+
+def _get_quote_url(from_amount, to_currency):
+    if type(from_amount) != Amount:
+        raise TypeError("from_amount must be with the Amount type")
+
+    if to_currency not in _CURRENCIES:
+        raise KeyError(to_currency)
+
+    return urljoin(_URL_QUOTE, '{}{}?amount={}&side=SELL'.format(
+        from_amount.currency,
+        to_currency,
+        from_amount.revolut_amount))
+
+
+def _amount_from_raw_quote(raw_quote, to_currency):
+    return Amount(revolut_amount=raw_quote["to"]["amount"],
+                  currency=to_currency)
+
+
+def _get_exchange_data(from_amount, to_currency):
+    if type(from_amount) != Amount:
+        raise TypeError("from_amount must be with the Amount type")
+
+    if to_currency not in _CURRENCIES:
+        raise KeyError(to_currency)
+
+    return {
+        "fromCcy": from_amount.currency,
+        "fromAmount": from_amount.revolut_amount,
+        "toCcy": to_currency,
+        "toAmount": None,
+    }
+
+
+def _transaction_from_raw_exchange(raw_exchange, from_amount):
+    if raw_exchange[0]["state"] == "COMPLETED":
+        amount = raw_exchange[0]["counterpart"]["amount"]
+        currency = raw_exchange[0]["counterpart"]["currency"]
+        exchanged_amount = Amount(revolut_amount=amount,
+                                  currency=currency)
+        exchange_transaction = Transaction(from_amount=from_amount,
+                                           to_amount=exchanged_amount,
+                                           date=datetime.now())
+    else:
+        raise ConnectionError("Transaction error : %s" % raw_exchange)
 
-        return exchange_transaction
+    return exchange_transaction
 
 
 class Account:
@@ -327,12 +1181,60 @@ class Accounts:
             )
             for account in self.raw_list
         ]
+        # Indexes built once, for the lookups
+        self._by_name = {}
+        self._by_currency = {}
+        self._by_type = {}
+        self._by_state = {}
+        for account in self.list:
+            # With duplicate names, the first account is returned (as before)
+            self._by_name.setdefault(account.name, account)
+            self._by_currency.setdefault(
+                account.balance.currency, []).append(account)
+            self._by_type.setdefault(account.account_type, []).append(account)
+            self._by_state.setdefault(account.state, []).append(account)
 
     def get_account_by_name(self, account_name):
         """ Get an account by its name """
-        for account in self.list:
-            if account.name == account_name:
-                return account
+        return self._by_name.get(account_name)
+
+    def get_accounts(self, currency=None, account_type=None, state=None):
+        """ Get the accounts with this currency, type and state """
+        candidates = [index.get(value, []) for index, value in [
+            (self._by_currency, currency),
+            (self._by_type, account_type),
+            (self._by_state, state)] if value is not None]
+        # Start from the smallest index
+        accounts = min(candidates, key=len) if candidates else self.list
+        return [account for account in accounts
+                if currency in (None, account.balance.currency)
+                and account_type in (None, account.account_type)
+                and state in (None, account.state)]
+
+    def by_currency(self):
+        """ Get the accounts by currency (dict) """
+        return {currency: list(accounts)
+                for currency, accounts in self._by_currency.items()}
+
+    def active(self):
+        """ Get the ACTIVE accounts """
+        return list(self._by_state.get(_ACTIVE_ACCOUNT, []))
+
+    def diff(self, other):
+        """ Get the balances changed between this snapshot and other (a more
+        recent Accounts object), by account name :
+        {name: (balance, other balance)}, with None for a missing account """
+        changes = {}
+        for name, account in self._by_name.items():
+            other_account = other._by_name.get(name)
+            if other_account is None:
+                changes[name] = (account.balance, None)
+            elif other_account.balance != account.balance:
+                changes[name] = (account.balance, other_account.balance)
+        for name, other_account in other._by_name.items():
+            if name not in self._by_name:
+                changes[name] = (None, other_account.balance)
+        return changes
 
     def __len__(self):
         return len(self.list)
@@ -343,25 +1245,40 @@ class Accounts:
         return self.list[key]
 
     def csv(self, lang="fr"):
+        csv_file = io.StringIO()
+        self.write_csv(csv_file, lang=lang)
+        return csv_file.getvalue().rstrip("\n")
+
+    def write_csv(self, csv_file, lang="fr"):
+        """ Write the active accounts to a file object, as csv """
         lang_is_fr = lang == "fr"
+        writer = _get_csv_writer(csv_file, lang=lang)
         if lang_is_fr:
-            csv_str = "Nom du compte;Solde;Devise"
+            writer.writerow(["Nom du compte", "Solde", "Devise"])
         else:
-            csv_str = "Account name,Balance,Currency"
+            writer.writerow(["Account name", "Balance", "Currency"])
 
-        # Europe uses 'comma' as decimal separator,
-        # so it can't be used as delimiter:
-        delimiter = ";" if lang_is_fr else ","
+        for account in self.active():  # Do not print INACTIVE
+            writer.writerow((
+                account.name,
+                _format_decimal(account.balance.real_amount_str, lang),
+                account.balance.currency,
+            ))
+
+
+def _get_csv_writer(csv_file, lang="fr"):
+    # Europe uses 'comma' as decimal separator,
+    # so it can't be used as delimiter:
+    delimiter = ";" if lang == "fr" else ","
+    return csv.writer(csv_file, delimiter=delimiter, lineterminator="\n")
 
-        for account in self.list:
-            if account.state == _ACTIVE_ACCOUNT:  # Do not print INACTIVE
-                csv_str += "\n" + delimiter.join((
-                    account.name,
-                    account.balance.real_amount_str,
-                    account.balance.currency,
-                ))
 
-        return csv_str.replace(".", ",") if lang_is_fr else csv_str
+def _format_decimal(number_str, lang="fr"):
+    """ Use the decimal separator of the language
+    >>> _format_decimal("-12.50", lang="fr")
+    '-12,50'
+    """
+    return number_str.replace(".", ",") if lang == "fr" else number_str
 
 
 class AccountTransaction:
@@ -416,57 +1333,98 @@ class AccountTransaction:
         return str(self.amount.real_amount)
 
 
+def _account_transaction_from_raw(transaction):
+    """ Build an AccountTransaction from a transaction dict of the API """
+    return AccountTransaction(
+        transactions_type=transaction.get("type"),
+        state=transaction.get("state"),
+        started_date=transaction.get("startedDate"),
+        completed_date=transaction.get("completedDate"),
+        amount=Amount(revolut_amount=transaction.get('amount'),
+                      currency=transaction.get('currency')),
+        fee=transaction.get('fee'),
+        description=transaction.get('description'),
+        account_id=transaction.get('account').get('id')
+    )
+
+
 class AccountTransactions:
-    """ Class to handle the account transactions """
+    """ Class to handle the account transactions.
+    The AccountTransaction objects are only built (once) when they are
+    accessed, raw_list (the dicts from the API) is always available """
 
     def __init__(self, account_transactions):
         self.raw_list = account_transactions
-        self.list = [
-            AccountTransaction(
-                transactions_type=transaction.get("type"),
-                state=transaction.get("state"),
-                started_date=transaction.get("startedDate"),
-                completed_date=transaction.get("completedDate"),
-                amount=Amount(revolut_amount=transaction.get('amount'),
-                              currency=transaction.get('currency')),
-                fee=transaction.get('fee'),
-                description=transaction.get('description'),
-                account_id=transaction.get('account').get('id')
-            )
-            for transaction in self.raw_list
-        ]
+        self._list = [None] * len(account_transactions)
+
+    @property
+    def list(self):
+        """ List of all the AccountTransaction objects """
+        for index, transaction in enumerate(self._list):
+            if transaction is None:
+                self[index]
+        return self._list
 
     def __len__(self):
-        return len(self.list)
+        return len(self.raw_list)
+
+    def __getitem__(self, key):
+        """ Method to access the object as a list
+        (ex : account_transactions[1]) """
+        if isinstance(key, slice):
+            return [self[index] for index in range(*key.indices(len(self)))]
+        transaction = self._list[key]
+        if transaction is None:
+            transaction = _account_transaction_from_raw(self.raw_list[key])
+            self._list[key] = transaction
+        return transaction
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __reversed__(self):
+        for index in reversed(range(len(self))):
+            yield self[index]
 
     def csv(self, lang="fr", reverse=False):
-        lang_is_fr = lang == "fr"
-        if lang_is_fr:
-            csv_str = "Date-heure (DD/MM/YYYY HH:MM:ss);Description;Montant;Devise"
-            date_format = _DATETIME_FORMAT
-        else:
-            csv_str = "Date-time (MM/DD/YYYY HH:MM:ss),Description,Amount,Currency"
-            date_format = "%m/%d/%Y %H:%M:%S"
-
-        # Europe uses 'comma' as decimal separator,
-        # so it can't be used as delimiter:
-        delimiter = ";" if lang_is_fr else ","
-
-        # Do not export declined or failed payments
-        transaction_list = list(reversed(self.list)) if reverse else self.list
-        for account_transaction in transaction_list:
-            if account_transaction.state not in [
-                _TRANSACTION_DECLINED,
-                _TRANSACTION_FAILED,
-                _TRANSACTION_REVERTED
-            ]:
-                csv_str += "\n" + delimiter.join((
-                    account_transaction.get_datetime__str(date_format),
-                    account_transaction.get_description(),
-                    account_transaction.get_amount__str(),
-                    account_transaction.amount.currency
-                ))
-        return csv_str.replace(".", ",") if lang_is_fr else csv_str
+        csv_file = io.StringIO()
+        self.write_csv(csv_file, lang=lang, reverse=reverse)
+        return csv_file.getvalue().rstrip("\n")
+
+    def write_csv(self, csv_file, lang="fr", reverse=False):
+        """ Write the transactions to a file object, as csv """
+        transactions = reversed(self) if reverse else self
+        write_account_transactions_csv(csv_file, transactions, lang=lang)
+
+
+def write_account_transactions_csv(csv_file, account_transactions, lang="fr"):
+    """ Write an iterable of AccountTransaction objects to a file object,
+    as csv, row by row (so that the transactions can be written
+    while they are received) """
+    writer = _get_csv_writer(csv_file, lang=lang)
+    if lang == "fr":
+        writer.writerow(["Date-heure (DD/MM/YYYY HH:MM:ss)", "Description",
+                         "Montant", "Devise"])
+        date_format = _DATETIME_FORMAT
+    else:
+        writer.writerow(["Date-time (MM/DD/YYYY HH:MM:ss)", "Description",
+                         "Amount", "Currency"])
+        date_format = "%m/%d/%Y %H:%M:%S"
+
+    # Do not export declined or failed payments
+    for account_transaction in account_transactions:
+        if account_transaction.state not in [
+            _TRANSACTION_DECLINED,
+            _TRANSACTION_FAILED,
+            _TRANSACTION_REVERTED
+        ]:
+            writer.writerow((
+                account_transaction.get_datetime__str(date_format),
+                account_transaction.get_description(),
+                _format_decimal(account_transaction.get_amount__str(), lang),
+                account_transaction.amount.currency
+            ))
 
 
 def get_token_step1(device_id, phone, password, simulate=False):
@@ -476,35 +1434,30 @@ def get_token_step1(device_id, phone, password, simulate=False):
     c = Client(device_id=device_id, token=_DEFAULT_TOKEN_FOR_SIGNIN)
     data = {"phone": phone, "password": password}
     ret = c._post(_URL_GET_TOKEN_STEP1, json=data)
-    channel = ret.json().get("channel")
+    channel = c._parse_json(ret).get("channel")
     return channel
 
 
 def get_token_step2(device_id, phone, code, simulate=False):
-    """ Function to obtain a Revolut token (step 2 : with code) """
+    """ Function to obtain a Revolut token (step 2 : with code)
+    >>> raw_get_token = get_token_step2("device_id", "+33612345678",
+    ...                                 "123-456", simulate=True)
+    >>> raw_get_token["accessToken"] = "modified"
+    >>> get_token_step2("device_id", "+33612345678", "123-456",
+    ...                 simulate=True)["accessToken"]
+    'myaccesstoken'
+    """
     if simulate:
         # Because we don't want to receive a code through sms
         # for every test ;)
-        simu = '{"user":{"id":"fakeuserid","createdDate":123456789,\
-        "address":{"city":"my_city","country":"FR","postcode":"12345",\
-        "region":"my_region","streetLine1":"1 rue mon adresse",\
-        "streetLine2":"Appt 1"},\"birthDate":[1980,1,1],"firstName":"John",\
-        "lastName":"Doe","phone":"+33612345678","email":"myemail@email.com",\
-        "emailVerified":false,"state":"ACTIVE","referralCode":"refcode",\
-        "kyc":"PASSED","termsVersion":"2018-05-25","underReview":false,\
-        "riskAssessed":false,"locale":"en-GB"},"wallet":{"id":"wallet_id",\
-        "ref":"12345678","state":"ACTIVE","baseCurrency":"EUR",\
-        "topupLimit":3000000,"totalTopup":0,"topupResetDate":123456789,\
-        "pockets":[{"id":"pocket_id","type":"CURRENT","state":"ACTIVE",\
-        "currency":"EUR","balance":100,"blockedAmount":0,"closed":false,\
-        "creditLimit":0}]},"accessToken":"myaccesstoken"}'
-        raw_get_token = json.loads(simu)
+        # (a copy, because the caller may modify it)
+        raw_get_token = copy.deepcopy(_SIMU_GET_TOKEN)
     else:
         c = Client(device_id=device_id, token=_DEFAULT_TOKEN_FOR_SIGNIN)
         code = code.replace("-", "")  # If the user would put -
         data = {"phone": phone, "code": code}
         ret = c._post(_URL_GET_TOKEN_STEP2, json=data)
-        raw_get_token = ret.json()
+        raw_get_token = c._parse_json(ret)
     return raw_get_token
 
 
@@ -522,6 +1475,6 @@ def signin_biometric(device_id, phone, access_token, selfie_filepath):
     c = Client(device_id=device_id, token=_DEFAULT_TOKEN_FOR_SIGNIN)
     c.session.auth = (phone, access_token)
     res = c._post(API_BASE + "/biometric-signin/selfie", files=files)
-    biometric_id = res.json()["id"]
+    biometric_id = c._parse_json(res)["id"]
     res = c._post(API_BASE + "/biometric-signin/confirm/" + biometric_id)
-    return res.json()
+    return c._parse_json(res)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Asyncio version of the Revolut client, to share one event loop between
+many concurrent requests.
+It requires aiohttp (pip install revolut[async])
+"""
+
+from revolut import (
+    API_BASE,
+    AccountTransactions,
+    _DEFAULT_JSON_LOADS,
+    _SIMU_EXCHANGE,
+    _URL_EXCHANGE,
+    _URL_GET_ACCOUNTS,
+    _URL_GET_TRANSACTIONS_LAST,
+    _accounts_from_raw_wallet,
+    _amount_from_raw_quote,
+    _get_exchange_data,
+    _get_headers,
+    _get_quote_url,
+    _replace_api_base,
+    _transaction_from_raw_exchange,
+)
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+class AsyncClient:
+    """ Do the requests with the Revolut servers, with asyncio """
+    def __init__(self, token, device_id, api_base=API_BASE,
+                 max_connections=100, json_loads=_DEFAULT_JSON_LOADS):
+        if aiohttp is None:
+            raise ImportError(
+                "aiohttp is required for the asyncio client "
+                "(pip install revolut[async])")
+        self.api_base = api_base
+        self.headers = _get_headers(token=token, device_id=device_id)
+        self.max_connections = max_connections
+        self.json_loads = json_loads
+        self.session = None
+
+    def _get_session(self):
+        # The session must be created inside the event loop
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.max_connections))
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _request_json(self, method, url, *, expected_status_code=200,
+                            **kwargs):
+        url = _replace_api_base(url, self.api_base)
+        async with self._get_session().request(method, url, **kwargs) as ret:
+            content = await ret.read()
+            if ret.status != expected_status_code:
+                raise ConnectionError(
+                    'Status code {} for url {}\n{}'.format(
+                        ret.status, url, content.decode(errors="replace")))
+        return self.json_loads(content)
+
+    async def _get_json(self, url, **kwargs):
+        return await self._request_json("GET", url, **kwargs)
+
+    async def _post_json(self, url, **kwargs):
+        return await self._request_json("POST", url, **kwargs)
+
+
+class AsyncRevolut:
+    """ Same methods as revolut.Revolut, as coroutines.
+    To be used as an async context manager to close the connections :
+    async with AsyncRevolut(token, device_id) as revolut:
+        accounts = await revolut.get_account_balances()
+    """
+    def __init__(self, token, device_id, api_base=API_BASE,
+                 max_connections=100, json_loads=_DEFAULT_JSON_LOADS):
+        self.client = AsyncClient(token=token, device_id=device_id,
+                                  api_base=api_base,
+                                  max_connections=max_connections,
+                                  json_loads=json_loads)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.client.close()
+
+    async def get_account_balances(self):
+        raw_wallet = await self.client._get_json(_URL_GET_ACCOUNTS)
+        self.account_balances = _accounts_from_raw_wallet(raw_wallet)
+        return self.account_balances
+
+    async def get_account_transactions(self, from_date=None, to_date=None):
+        raw_transactions = []
+        params = {}
+        if to_date:
+            params['to'] = int(to_date.timestamp()) * 1000
+        if from_date:
+            params['from'] = int(from_date.timestamp()) * 1000
+
+        while True:
+            ret_transactions = await self.client._get_json(
+                _URL_GET_TRANSACTIONS_LAST, params=params)
+            if not ret_transactions:
+                break
+            params['to'] = ret_transactions[-1]['startedDate']
+            raw_transactions.extend(ret_transactions)
+        return AccountTransactions(raw_transactions)
+
+    async def get_wallet_id(self):
+        raw_wallet = await self.client._get_json(_URL_GET_ACCOUNTS)
+        return raw_wallet.get('id')
+
+    async def quote(self, from_amount, to_currency):
+        url_quote = _get_quote_url(from_amount, to_currency)
+        raw_quote = await self.client._get_json(url_quote)
+        return _amount_from_raw_quote(raw_quote, to_currency)
+
+    async def exchange(self, from_amount, to_currency, simulate=False):
+        data = _get_exchange_data(from_amount, to_currency)
+
+        if simulate:
+            raw_exchange = _SIMU_EXCHANGE
+        else:
+            raw_exchange = await self.client._post_json(_URL_EXCHANGE,
+                                                        json=data)
+
+        return _transaction_from_raw_exchange(raw_exchange, from_amount)
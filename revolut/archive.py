@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Compact binary archive of the account transactions.
+The file has a header, fixed-width records sorted by 'startedDate' (so that
+a time range is found by binary search), then a heap with the strings.
+It is read with mmap, without loading the whole file
+"""
+
+import csv
+import gzip
+import json
+import mmap
+import struct
+from datetime import datetime
+
+from revolut import (
+    AccountTransactions,
+    Amount,
+    _DATETIME_FORMAT,
+    _TRANSACTION_COMPLETED,
+    _TRANSACTION_PENDING,
+    _account_transaction_from_raw,
+)
+from revolut.columnar import ColumnarTransactions, _NO_DATE, _get_timestamp
+
+_MAGIC = b"RVTA"
+_VERSION = 1
+# magic, version, record size, number of records, first and last
+# 'startedDate', offset and size of the string heap, of the code tables
+_HEADER = struct.Struct("<4sHHQqqQQQQ")
+# startedDate, completedDate, amount, fee, codes of the currency, state,
+# type and account id, offset and size of the description and of the id
+_RECORD = struct.Struct("<qqqqIIIIQIQI")
+_CODE_TABLES = ["currencies", "states", "types", "account_ids"]
+
+
+def save_archive(filename, raw_transactions):
+    """ Save the transactions (dicts from the API, or an AccountTransactions
+    object) in an archive file. Returns the number of transactions saved """
+    if isinstance(raw_transactions, AccountTransactions):
+        raw_transactions = raw_transactions.raw_list
+    columns = ColumnarTransactions(raw_transactions)
+    order = sorted(range(len(columns)),
+                   key=lambda index: columns.started_dates[index])
+
+    heap = bytearray()
+    heap_offsets = {}
+
+    def add_to_heap(value):
+        # Identical strings are stored once
+        if value not in heap_offsets:
+            heap_offsets[value] = len(heap)
+            heap.extend(value.encode())
+        return heap_offsets[value], len(value.encode())
+
+    records_size = len(order) * _RECORD.size
+    heap_offset = _HEADER.size + records_size
+    with open(filename, "wb") as f:
+        f.seek(_HEADER.size)
+        for index in order:
+            description = add_to_heap(columns.descriptions.get(index))
+            transaction_id = add_to_heap(columns.ids.get(index))
+            f.write(_RECORD.pack(
+                columns.started_dates[index],
+                columns.completed_dates[index],
+                columns.amounts[index],
+                columns.fees[index],
+                columns.currency_codes[index],
+                columns.state_codes[index],
+                columns.type_codes[index],
+                columns.account_id_codes[index],
+                description[0], description[1],
+                transaction_id[0], transaction_id[1],
+            ))
+        f.write(heap)
+        code_tables = json.dumps({
+            name: getattr(columns, name).values for name in _CODE_TABLES
+        }).encode()
+        f.write(code_tables)
+        f.seek(0)
+        f.write(_HEADER.pack(
+            _MAGIC, _VERSION, _RECORD.size, len(order),
+            columns.started_dates[order[0]] if order else 0,
+            columns.started_dates[order[-1]] if order else 0,
+            heap_offset, len(heap),
+            heap_offset + len(heap), len(code_tables),
+        ))
+    return len(order)
+
+
+def load_archive(filename, from_date=None, to_date=None):
+    """ Get the AccountTransactions of an archive file, most recent first
+    (like the Revolut API), optionally between from_date and to_date """
+    with TransactionArchive(filename) as archive:
+        return archive.account_transactions(from_date=from_date,
+                                            to_date=to_date)
+
+
+class TransactionArchive:
+    """ Class to read an archive file (see save_archive) with mmap """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            self.close()
+            raise ValueError("{} is not a transaction archive".format(
+                filename))
+        (magic, version, record_size, self.count,
+         self.first_started_date, self.last_started_date,
+         self._heap_offset, heap_size,
+         codes_offset, codes_size) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _VERSION or \
+                record_size != _RECORD.size:
+            self.close()
+            raise ValueError("{} is not a transaction archive (version {})"
+                             .format(filename, _VERSION))
+        code_tables = json.loads(
+            self._mmap[codes_offset:codes_offset + codes_size])
+        for name in _CODE_TABLES:
+            setattr(self, name, code_tables[name])
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def get_started_date(self, index):
+        return struct.unpack_from(
+            "<q", self._mmap, _HEADER.size + index * _RECORD.size)[0]
+
+    def _bisect(self, timestamp, right=False):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            started_date = self.get_started_date(middle)
+            if started_date < timestamp or \
+                    (right and started_date == timestamp):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_indexes(self, from_date=None, to_date=None):
+        """ Get the range of the records started between from_date and
+        to_date (datetime objects or timestamps in ms), by binary search """
+        start = 0 if from_date is None else \
+            self._bisect(_get_timestamp(from_date))
+        stop = self.count if to_date is None else \
+            self._bisect(_get_timestamp(to_date), right=True)
+        return range(start, max(start, stop))
+
+    def _get_string(self, offset, size):
+        start = self._heap_offset + offset
+        return self._mmap[start:start + size].decode()
+
+    def get_raw(self, index):
+        """ Get the transaction dict of a record """
+        (started_date, completed_date, amount, fee, currency_code,
+         state_code, type_code, account_id_code,
+         description_offset, description_size,
+         id_offset, id_size) = _RECORD.unpack_from(
+            self._mmap, _HEADER.size + index * _RECORD.size)
+        return {
+            "id": self._get_string(id_offset, id_size),
+            "type": self.types[type_code],
+            "state": self.states[state_code],
+            "startedDate": started_date,
+            "completedDate": None if completed_date == _NO_DATE
+            else completed_date,
+            "amount": amount,
+            "fee": fee,
+            "currency": self.currencies[currency_code],
+            "description": self._get_string(description_offset,
+                                            description_size),
+            "account": {"id": self.account_ids[account_id_code]},
+        }
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return _account_transaction_from_raw(self.get_raw(index))
+
+    def get_raw_transactions(self, from_date=None, to_date=None):
+        """ Get the transaction dicts between from_date and to_date,
+        most recent first """
+        return [self.get_raw(index) for index in
+                reversed(self.get_indexes(from_date, to_date))]
+
+    def account_transactions(self, from_date=None, to_date=None):
+        return AccountTransactions(
+            self.get_raw_transactions(from_date=from_date, to_date=to_date))
+
+
+def convert_export(export_filename, archive_filename, lang="fr"):
+    """ Convert an export of revolut_transactions.py (.csv, .json, .ndjson,
+    optionally .gz) to an archive file.
+    The csv exports only have the date, description, amount and currency
+    of the transactions : the other fields are left empty.
+    Returns the number of transactions saved """
+    name = export_filename[:-3] if export_filename.endswith(".gz") \
+        else export_filename
+    if not name.endswith((".csv", ".json", ".ndjson")):
+        raise ValueError("Unknown export format : {}".format(export_filename))
+    open_function = gzip.open if export_filename.endswith(".gz") else open
+    with open_function(export_filename, "rt", newline="") as f:
+        if name.endswith(".ndjson"):
+            raw_transactions = [json.loads(line) for line in f if line.strip()]
+        elif name.endswith(".json"):
+            raw_transactions = json.load(f)
+        else:
+            raw_transactions = list(_csv_export_to_raw(f, lang=lang))
+    return save_archive(archive_filename, raw_transactions)
+
+
+def _csv_export_to_raw(csv_file, lang="fr"):
+    if lang == "fr":
+        delimiter = ";"
+        date_format = _DATETIME_FORMAT
+    else:
+        delimiter = ","
+        date_format = "%m/%d/%Y %H:%M:%S"
+    reader = csv.reader(csv_file, delimiter=delimiter)
+    next(reader)  # Header
+    pending_suffix = " **pending**"
+    for date_str, description, amount_str, currency in reader:
+        timestamp = int(datetime.strptime(
+            date_str, date_format).timestamp()) * 1000
+        state = _TRANSACTION_COMPLETED
+        if description.endswith(pending_suffix):
+            description = description[:-len(pending_suffix)]
+            state = _TRANSACTION_PENDING
+        amount = Amount(real_amount=float(amount_str.replace(",", ".")),
+                        currency=currency)
+        yield {
+            "id": "",
+            "type": "",
+            "state": state,
+            "startedDate": timestamp,
+            "completedDate": None if state == _TRANSACTION_PENDING
+            else timestamp,
+            "amount": amount.revolut_amount,
+            "fee": 0,
+            "currency": currency,
+            "description": description,
+            "account": {"id": ""},
+        }
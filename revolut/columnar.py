@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar representation of the account transactions, to keep large
+histories in memory with a few bytes per transaction.
+NumPy is used to filter them when it is installed
+"""
+
+from array import array
+from datetime import datetime
+
+from revolut import AccountTransaction, Amount
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+_NO_DATE = -1  # Pending transactions have no completed date yet
+
+
+class StringCodes:
+    """ Dictionary encoding of repeated strings (ex : currencies) """
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+
+class StringTable:
+    """ Strings stored one after the other in a single string,
+    with their offsets (ex : descriptions) """
+    def __init__(self):
+        self.offsets = array('Q', [0])
+        self._parts = []
+        self._table = ""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, value):
+        self._parts.append(value)
+        self.offsets.append(self.offsets[-1] + len(value))
+
+    @property
+    def table(self):
+        if self._parts:
+            self._table += "".join(self._parts)
+            self._parts = []
+        return self._table
+
+    def get(self, index):
+        return self.table[self.offsets[index]:self.offsets[index + 1]]
+
+
+class ColumnarTransactions:
+    """ Class to handle the account transactions by column :
+    typed arrays for the dates (timestamps in ms) and the amounts (Revolut
+    amounts), codes for the repeated strings, and string tables for the ids
+    and the descriptions. The AccountTransaction objects are built only when
+    a row is accessed """
+
+    def __init__(self, raw_transactions=()):
+        self.started_dates = array('q')
+        self.completed_dates = array('q')
+        self.amounts = array('q')
+        self.fees = array('q')
+        self.currency_codes = array('I')
+        self.state_codes = array('I')
+        self.type_codes = array('I')
+        self.account_id_codes = array('I')
+        self.currencies = StringCodes()
+        self.states = StringCodes()
+        self.types = StringCodes()
+        self.account_ids = StringCodes()
+        self.ids = StringTable()
+        self.descriptions = StringTable()
+        self.extend(raw_transactions)
+
+    def extend(self, raw_transactions):
+        """ Add transactions (dict from the API), from any iterable
+        (ex : Revolut.iter_raw_account_transactions()) """
+        for transaction in raw_transactions:
+            completed_date = transaction.get("completedDate")
+            self.started_dates.append(transaction.get("startedDate"))
+            self.completed_dates.append(
+                _NO_DATE if completed_date is None else completed_date)
+            self.amounts.append(transaction.get("amount"))
+            self.fees.append(transaction.get("fee") or 0)
+            self.currency_codes.append(
+                self.currencies.encode(transaction.get("currency")))
+            self.state_codes.append(
+                self.states.encode(transaction.get("state")))
+            self.type_codes.append(
+                self.types.encode(transaction.get("type")))
+            self.account_id_codes.append(
+                self.account_ids.encode(transaction.get("account").get("id")))
+            self.ids.append(transaction.get("id", ""))
+            self.descriptions.append(transaction.get("description") or "")
+
+    def __len__(self):
+        return len(self.started_dates)
+
+    def __getitem__(self, index):
+        """ Build the AccountTransaction of a row """
+        if index < 0:
+            index += len(self)
+        completed_date = self.completed_dates[index]
+        return AccountTransaction(
+            transactions_type=self.types.decode(self.type_codes[index]),
+            state=self.states.decode(self.state_codes[index]),
+            started_date=self.started_dates[index],
+            completed_date=None if completed_date == _NO_DATE
+            else completed_date,
+            amount=Amount(revolut_amount=self.amounts[index],
+                          currency=self.get_currency(index)),
+            fee=self.fees[index],
+            description=self.descriptions.get(index),
+            account_id=self.account_ids.decode(self.account_id_codes[index])
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def get_currency(self, index):
+        return self.currencies.decode(self.currency_codes[index])
+
+    def get_raw(self, index):
+        """ Rebuild the transaction dict (with the stored fields only) """
+        completed_date = self.completed_dates[index]
+        return {
+            "id": self.ids.get(index),
+            "type": self.types.decode(self.type_codes[index]),
+            "state": self.states.decode(self.state_codes[index]),
+            "startedDate": self.started_dates[index],
+            "completedDate": None if completed_date == _NO_DATE
+            else completed_date,
+            "amount": self.amounts[index],
+            "fee": self.fees[index],
+            "currency": self.get_currency(index),
+            "description": self.descriptions.get(index),
+            "account": {
+                "id": self.account_ids.decode(self.account_id_codes[index])},
+        }
+
+    def where(self, state=None, currency=None, from_date=None, to_date=None):
+        """ Get the indexes of the transactions with this state and currency,
+        started between from_date and to_date (datetime objects) """
+        conditions = []
+        if state is not None:
+            code = self.states.codes.get(state)
+            if code is None:
+                return []
+            conditions.append((self.state_codes, "==", code))
+        if currency is not None:
+            code = self.currencies.codes.get(currency)
+            if code is None:
+                return []
+            conditions.append((self.currency_codes, "==", code))
+        if from_date is not None:
+            conditions.append((self.started_dates, ">=",
+                               _get_timestamp(from_date)))
+        if to_date is not None:
+            conditions.append((self.started_dates, "<=",
+                               _get_timestamp(to_date)))
+
+        if numpy is not None:
+            return _where_numpy(conditions, len(self))
+        return _where_python(conditions, len(self))
+
+    def take(self, indexes):
+        """ Get a new ColumnarTransactions with the rows of indexes """
+        return ColumnarTransactions(self.get_raw(index) for index in indexes)
+
+    def sum_amounts(self, indexes=None):
+        """ Get the sum of the amounts by currency, for all the rows or
+        the rows of indexes (ex : from where()) """
+        if indexes is None:
+            indexes = range(len(self))
+        if numpy is not None:
+            indexes = numpy.asarray(indexes, dtype=numpy.int64)
+            amounts = numpy.frombuffer(self.amounts, dtype=numpy.int64)
+            codes = numpy.frombuffer(self.currency_codes, dtype=numpy.uint32)
+            amounts, codes = amounts[indexes], codes[indexes]
+            sums_by_code = {int(code): int(amounts[codes == code].sum())
+                            for code in numpy.unique(codes)}
+        else:
+            sums_by_code = {}
+            for index in indexes:
+                code = self.currency_codes[index]
+                sums_by_code[code] = sums_by_code.get(code, 0) + \
+                    self.amounts[index]
+        return {
+            self.currencies.decode(code): Amount(
+                revolut_amount=total,
+                currency=self.currencies.decode(code))
+            for code, total in sums_by_code.items()
+        }
+
+
+def _get_timestamp(date):
+    if isinstance(date, datetime):
+        return int(date.timestamp()) * 1000
+    return date
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+def _where_python(conditions, length):
+    indexes = range(length)
+    for column, operator, value in conditions:
+        compare = _OPERATORS[operator]
+        indexes = [index for index in indexes if compare(column[index], value)]
+    return list(indexes)
+
+
+def _where_numpy(conditions, length):
+    mask = numpy.ones(length, dtype=bool)
+    for column, operator, value in conditions:
+        values = numpy.frombuffer(column, dtype=numpy.dtype(column.typecode))
+        mask &= _OPERATORS[operator](values, value)
+    return numpy.flatnonzero(mask).tolist()
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in of the Revolut API, for load and latency tests
+(the real API can't be used for that).
+It answers /user/current/wallet, /user/current/transactions/last,
+/quote/ and /exchange with synthetic data, after a configurable latency,
+and can simulate server errors and rate limits :
+    python -m revolut.fake_server --port 8080 --latency 0.05 --jitter 0.02
+then use Revolut(..., api_base="http://127.0.0.1:8080")
+"""
+
+import argparse
+import bisect
+import json
+import random
+import socketserver
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from revolut import Amount
+
+_DEFAULT_HISTORY_SIZE = 1000
+_DEFAULT_PAGE_SIZE = 100
+_HISTORY_INTERVAL = 3600 * 1000  # ms between 2 synthetic transactions
+# Value of one unit of each currency, in EUR (1 for the other currencies)
+_RATES_IN_EUR = {
+    "EUR": 1.,
+    "USD": 0.9,
+    "GBP": 1.15,
+    "CHF": 0.92,
+    "BTC": 8000.,
+    "ETH": 160.,
+    "BCH": 200.,
+    "LTC": 50.,
+    "XRP": 0.25,
+}
+_DEFAULT_BALANCES = {"EUR": 100000, "USD": 50000, "BTC": 1000000}
+
+
+class FakeRevolutServer(socketserver.ThreadingMixIn, HTTPServer):
+    """ HTTP server answering like the Revolut API
+    - latency, jitter : delay (in seconds) of each response,
+    latency +/- a random jitter
+    - error_rate : ratio of the requests answered with a 503 error
+    - rate_limit : maximum number of requests per second (0 for no limit),
+    the other requests are answered with a 429 error and a 'Retry-After'
+    - history_size : number of transactions in the synthetic history,
+    returned page_size by page_size (most recent first)
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0., jitter=0.,
+                 error_rate=0., rate_limit=0,
+                 history_size=_DEFAULT_HISTORY_SIZE,
+                 page_size=_DEFAULT_PAGE_SIZE, balances=None, seed=None):
+        super().__init__((host, port), FakeRevolutHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.page_size = page_size
+        self.balances = dict(balances or _DEFAULT_BALANCES)
+        self.random = random.Random(seed)
+        self.requests_nb = 0
+        self._wallet_version = 0
+        self._lock = threading.Lock()
+        self._rate_limit_tokens = rate_limit
+        self._rate_limit_time = time.monotonic()
+        self._thread = None
+        self.history = make_history(history_size)
+        # Sorted keys, to find the pages by binary search
+        self._negated_dates = [-transaction["startedDate"]
+                               for transaction in self.history]
+
+    @property
+    def api_base(self):
+        host, port = self.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        """ Serve in a background thread """
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def get_delay(self):
+        with self._lock:
+            jitter = self.random.uniform(-self.jitter, self.jitter)
+        return max(0., self.latency + jitter)
+
+    def get_error(self):
+        """ Get the (status, message) of a simulated error, or None """
+        with self._lock:
+            self.requests_nb += 1
+            if self.rate_limit:
+                # Token bucket, refilled with rate_limit tokens per second
+                now = time.monotonic()
+                self._rate_limit_tokens = min(
+                    self.rate_limit, self._rate_limit_tokens +
+                    (now - self._rate_limit_time) * self.rate_limit)
+                self._rate_limit_time = now
+                if self._rate_limit_tokens < 1:
+                    return 429, "Too many requests"
+                self._rate_limit_tokens -= 1
+            if self.error_rate and self.random.random() < self.error_rate:
+                return 503, "Service unavailable"
+        return None
+
+    def get_wallet(self):
+        with self._lock:
+            return self._wallet_version, {
+                "id": "wallet_id",
+                "ref": "12345678",
+                "state": "ACTIVE",
+                "baseCurrency": "EUR",
+                "pockets": [{
+                    "id": "pocket_{}".format(currency),
+                    "type": "CURRENT",
+                    "state": "ACTIVE",
+                    "currency": currency,
+                    "balance": balance,
+                } for currency, balance in self.balances.items()],
+            }
+
+    def get_transactions(self, from_timestamp=None, to_timestamp=None):
+        """ Get a page of the transactions started from from_timestamp
+        (included) to to_timestamp (excluded), most recent first """
+        start = 0 if to_timestamp is None else \
+            bisect.bisect_right(self._negated_dates, -to_timestamp)
+        page = self.history[start:start + self.page_size]
+        if from_timestamp is not None:
+            page = [transaction for transaction in page
+                    if transaction["startedDate"] >= from_timestamp]
+        return page
+
+    def exchange(self, from_currency, from_amount, to_currency):
+        to_amount = get_quote(from_currency, from_amount, to_currency)
+        now = int(time.time() * 1000)
+        with self._lock:
+            if self.balances.get(from_currency, 0) < from_amount:
+                state = "DECLINED"
+            else:
+                state = "COMPLETED"
+                self.balances[from_currency] -= from_amount
+                self.balances[to_currency] = \
+                    self.balances.get(to_currency, 0) + to_amount
+                self._wallet_version += 1
+        legs = []
+        for currency, amount, counterpart_currency, counterpart_amount in [
+                (from_currency, -from_amount, to_currency, to_amount),
+                (to_currency, to_amount, from_currency, -from_amount)]:
+            legs.append({
+                "id": "exchange_{}".format(now),
+                "type": "EXCHANGE",
+                "state": state,
+                "startedDate": now,
+                "completedDate": now,
+                "updatedDate": now,
+                "currency": currency,
+                "amount": amount,
+                "fee": 0,
+                "account": {"id": "pocket_{}".format(currency)},
+                "counterpart": {
+                    "account": {
+                        "id": "pocket_{}".format(counterpart_currency)},
+                    "amount": counterpart_amount,
+                    "currency": counterpart_currency,
+                },
+            })
+        return legs
+
+
+def make_history(size, last_timestamp=None):
+    """ Synthetic transactions, most recent first (one per hour) """
+    if last_timestamp is None:
+        last_timestamp = int(datetime.now().timestamp()) * 1000
+    history = []
+    for index in range(size):
+        started_date = last_timestamp - index * _HISTORY_INTERVAL
+        state = "PENDING" if index < 3 else "COMPLETED"
+        history.append({
+            "id": "transaction_{}".format(index),
+            "type": "CARD_PAYMENT",
+            "state": state,
+            "startedDate": started_date,
+            "completedDate": started_date + 1000
+            if state == "COMPLETED" else None,
+            "amount": -(index % 5000 + 1),
+            "fee": 0,
+            "currency": "EUR",
+            "description": "Shop {}".format(index % 100),
+            "account": {"id": "pocket_EUR"},
+        })
+    return history
+
+
+def get_quote(from_currency, from_amount, to_currency):
+    """ Get the Revolut amount of to_currency for a Revolut amount of
+    from_currency
+    >>> get_quote("EUR", 1000, "USD")  # 10 EUR => 11.11 USD
+    1111
+    """
+    real_amount = Amount(revolut_amount=from_amount,
+                         currency=from_currency).real_amount
+    rate = _RATES_IN_EUR.get(from_currency, 1.) / \
+        _RATES_IN_EUR.get(to_currency, 1.)
+    return Amount(real_amount=real_amount * rate,
+                  currency=to_currency).revolut_amount
+
+
+class FakeRevolutHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    disable_nagle_algorithm = True  # Headers and body are sent separately
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._answer("GET")
+
+    def do_POST(self):
+        self._answer("POST")
+
+    def _answer(self, method):
+        url = urlparse(self.path)
+        params = {key: values[0]
+                  for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+
+        time.sleep(self.server.get_delay())
+        error = self.server.get_error()
+        if error is not None:
+            status, message = error
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            return self._send(status, {"message": message}, headers)
+
+        try:
+            if method == "GET" and url.path == "/user/current/wallet":
+                return self._get_wallet()
+            if method == "GET" and \
+                    url.path == "/user/current/transactions/last":
+                return self._send(200, self.server.get_transactions(
+                    from_timestamp=_get_int(params, "from"),
+                    to_timestamp=_get_int(params, "to")))
+            if method == "GET" and url.path.startswith("/quote/"):
+                pair = url.path[len("/quote/"):]
+                return self._send(200, {
+                    "from": {"currency": pair[:3],
+                             "amount": int(params["amount"])},
+                    "to": {"currency": pair[3:], "amount": get_quote(
+                        pair[:3], int(params["amount"]), pair[3:])},
+                })
+            if method == "POST" and url.path == "/exchange":
+                data = json.loads(body)
+                return self._send(200, self.server.exchange(
+                    data["fromCcy"], data["fromAmount"], data["toCcy"]))
+        except (KeyError, ValueError) as e:
+            return self._send(400, {"message": "Bad request : {}".format(e)})
+        return self._send(404, {"message": "Not found"})
+
+    def _get_wallet(self):
+        version, wallet = self.server.get_wallet()
+        etag = '"{}"'.format(version)
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, None, {"ETag": etag})
+        return self._send(200, wallet, {"ETag": etag})
+
+    def _send(self, status, json_obj, headers=None):
+        body = b"" if json_obj is None else json.dumps(json_obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _get_int(params, key):
+    return int(params[key]) if key in params else None
+
+
+def main():  # pragma: no cover
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.,
+                        help="delay of the responses, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.,
+                        help="random +/- variation of the delay, in seconds")
+    parser.add_argument("--error_rate", type=float, default=0.,
+                        help="ratio of the requests answered with a 503")
+    parser.add_argument("--rate_limit", type=int, default=0,
+                        help="maximum number of requests per second")
+    parser.add_argument("--history_size", type=int,
+                        default=_DEFAULT_HISTORY_SIZE)
+    parser.add_argument("--page_size", type=int, default=_DEFAULT_PAGE_SIZE)
+    args = parser.parse_args()
+    server = FakeRevolutServer(
+        host=args.host, port=args.port, latency=args.latency,
+        jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, history_size=args.history_size,
+        page_size=args.page_size)
+    print("Fake Revolut API on {}".format(server.api_base))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
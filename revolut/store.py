@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Local SQLite store for the Revolut transactions, used to sync them
+incrementally instead of downloading the whole history on every run
+"""
+
+import json
+import sqlite3
+
+from revolut import AccountTransactions
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    started_date INTEGER NOT NULL,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_started_date
+    ON transactions (started_date);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+
+class TransactionStore:
+    """ Class to store the raw Revolut transactions, keyed by their id """
+
+    def __init__(self, filename=":memory:"):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    def upsert(self, raw_transactions):
+        """ Insert the transactions, or replace them if their id is
+        already known (ex : a PENDING transaction which is now COMPLETED).
+        Returns the number of transactions written """
+        rows = [
+            (transaction["id"], transaction["startedDate"],
+             json.dumps(transaction))
+            for transaction in raw_transactions
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO transactions (id, started_date, raw) "
+                "VALUES (?, ?, ?)", rows)
+        return len(rows)
+
+    def last_started_date(self):
+        """ Get the most recent 'startedDate' (timestamp in ms) stored,
+        or None if the store is empty """
+        return self.connection.execute(
+            "SELECT MAX(started_date) FROM transactions").fetchone()[0]
+
+    def synced_from(self):
+        """ Get the oldest date (timestamp in ms) the store was synced from,
+        or None if it was never synced """
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'synced_from'").fetchone()
+        return row[0] if row else None
+
+    def set_synced_from(self, timestamp):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) "
+                "VALUES ('synced_from', ?)", (timestamp,))
+
+    def raw_transactions(self, from_date=None, to_date=None):
+        """ Get the raw transactions between from_date and to_date
+        (datetime objects), most recent first like the Revolut API """
+        query = "SELECT raw FROM transactions"
+        conditions = []
+        params = []
+        if from_date:
+            conditions.append("started_date >= ?")
+            params.append(int(from_date.timestamp()) * 1000)
+        if to_date:
+            conditions.append("started_date <= ?")
+            params.append(int(to_date.timestamp()) * 1000)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY started_date DESC, id"
+        return [json.loads(raw) for (raw,) in
+                self.connection.execute(query, params)]
+
+    def account_transactions(self, from_date=None, to_date=None):
+        """ Build an AccountTransactions object from the stored transactions
+        """
+        return AccountTransactions(
+            self.raw_transactions(from_date=from_date, to_date=to_date))
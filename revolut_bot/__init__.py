@@ -3,12 +3,22 @@
 This package allows you to control the Revolut bot
 """
 
+import collections
+import contextlib
 import csv
+import heapq
 import io
+import itertools
+import logging
+import os
+import threading
+import time
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from revolut import Amount
+from revolut import get_percentile
 from revolut import Transaction
 from revolut import _DATETIME_FORMAT
 
@@ -22,6 +32,12 @@ _CSV_COLUMNS = [
     "to_currency"
 ]
 
+# Size of the blocks read from the end of the history file
+_TAIL_BLOCK_SIZE = 4096
+# Number of ticks kept for the percentiles of the phase durations
+_DEFAULT_TIMING_WINDOW = 100
+_TIMING_PERCENTS = (50, 90, 99)
+
 
 def csv_to_dict(csv_str, separator=","):
     """
@@ -73,6 +89,39 @@ def update_historyfile(filename, exchange_transaction):
     append_dict_to_csv(filename=filename, dict_obj=tr_dict)
 
 
+class HistoryFile:
+    """ Class to keep the last transaction of a history file in memory.
+    The file is read again only if it was changed by something else
+    (its modification time, size or inode changed) """
+    def __init__(self, filename, separator=","):
+        self.filename = filename
+        self.separator = separator
+        self._file_signature = None
+        self._last_transaction = None
+
+    def get_file_signature(self):
+        file_stat = os.stat(self.filename)
+        return (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+
+    def get_last_transaction(self):
+        file_signature = self.get_file_signature()
+        if file_signature != self._file_signature:
+            self._last_transaction = get_last_transaction_from_csv(
+                filename=self.filename,
+                separator=self.separator
+            )
+            self._file_signature = file_signature
+        return self._last_transaction
+
+    def add_transaction(self, exchange_transaction):
+        """ Append the transaction to the file, and keep it as the last one
+        """
+        update_historyfile(filename=self.filename,
+                           exchange_transaction=exchange_transaction)
+        self._last_transaction = exchange_transaction
+        self._file_signature = self.get_file_signature()
+
+
 def read_file_to_str(filename):
     with open(filename, 'r') as f:
         ret_str = f.read()
@@ -88,15 +137,53 @@ def get_last_transactions_from_csv(
     return list(map(dict_transaction_to_transaction, last_transactions))
 
 
-def dict_transaction_to_transaction(tr_dict):
-    """ Converts a transaction dictionary to a Transaction object """
-    if set(tr_dict) != set(_CSV_COLUMNS):
+def get_last_transaction_from_csv(
+    filename="exchange_history.csv",
+    separator=","
+):
+    """ Get the last transaction of the csv file.
+    Only the header and the end of the file are read,
+    so the cost does not depend on the size of the file """
+    with open(filename, 'rb') as f:
+        header = f.readline()
+        columns = next(csv.reader([header.decode()], delimiter=separator))
+        check_csv_columns(columns)
+        last_line = read_last_line(f, start=len(header))
+    if not last_line:
+        raise IndexError("No transaction in {}".format(filename))
+    values = next(csv.reader([last_line.decode()], delimiter=separator))
+    return dict_transaction_to_transaction(dict(zip(columns, values)))
+
+
+def read_last_line(f, start=0):
+    """ Get the last non-empty line (bytes) of a binary file object,
+    after the position start, reading it backwards by blocks """
+    position = f.seek(0, os.SEEK_END)
+    data = b""
+    while position > start:
+        read_size = min(_TAIL_BLOCK_SIZE, position - start)
+        position -= read_size
+        f.seek(position)
+        data = f.read(read_size) + data
+        lines = data.rstrip(b"\r\n").rsplit(b"\n", 1)
+        if len(lines) == 2:
+            return lines[1].rstrip(b"\r")
+    return data.strip(b"\r\n")
+
+
+def check_csv_columns(columns):
+    if set(columns) != set(_CSV_COLUMNS):
         raise TypeError(
             "Columns expected : {}\n{} received".format(
                 _CSV_COLUMNS,
-                list(tr_dict)
+                list(columns)
             )
         )
+
+
+def dict_transaction_to_transaction(tr_dict):
+    """ Converts a transaction dictionary to a Transaction object """
+    check_csv_columns(tr_dict)
     str_date = "{} {}".format(tr_dict["date"],
                               tr_dict["hour"])
     tr = Transaction(
@@ -126,3 +213,192 @@ def get_amount_with_margin(amount, percent_margin):
     margin = percent_margin/100
     amount_with_margin = amount.real_amount * (1 + margin)
     return Amount(real_amount=amount_with_margin, currency=amount.currency)
+
+
+class Scheduler:
+    """ Class to run several jobs periodically, in one process.
+    Each job runs on its own worker thread, so a slow job does not delay
+    the others, and a job is never run twice at the same time.
+    The runs follow a fixed cadence (start + n * interval), so they do not
+    drift by the duration of each run. If a run lasts longer than the
+    interval, the missed runs are skipped.
+    A job may return the interval (in seconds) before its next run,
+    to poll more or less often """
+    def __init__(self):
+        self._jobs = []  # Heap of (next run time, job number, job)
+        self._job_numbers = itertools.count()
+        self._condition = threading.Condition()
+        self._running_jobs = 0
+        self._stopped = False
+
+    def add_job(self, func, interval, delay=0, name=None):
+        """ Run func() every interval seconds, starting after delay seconds
+        """
+        job = {"func": func, "interval": interval,
+               "name": name or getattr(func, "__name__", "job")}
+        with self._condition:
+            self._push(time.monotonic() + delay, job)
+
+    def _push(self, next_run, job):
+        heapq.heappush(self._jobs, (next_run, next(self._job_numbers), job))
+        self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def run(self):
+        """ Run the jobs until stop() is called """
+        with ThreadPoolExecutor(max_workers=max(1, len(self._jobs))) \
+                as executor:
+            with self._condition:
+                while not self._stopped:
+                    if not self._jobs:
+                        self._condition.wait()
+                        continue
+                    next_run, _, job = self._jobs[0]
+                    wait = next_run - time.monotonic()
+                    if wait > 0:
+                        self._condition.wait(wait)
+                        continue
+                    heapq.heappop(self._jobs)
+                    self._running_jobs += 1
+                    executor.submit(self._run_job, job, next_run)
+                # Wait for the running jobs
+                while self._running_jobs:
+                    self._condition.wait()
+
+    def _run_job(self, job, scheduled_run):
+        interval = None
+        try:
+            interval = job["func"]()
+        except Exception:
+            logging.exception('Job {} failed'.format(job["name"]))
+        if interval is None:
+            interval = job["interval"]
+        with self._condition:
+            self._running_jobs -= 1
+            self._push(get_next_run(scheduled_run, interval, time.monotonic()),
+                       job)
+
+
+def get_next_run(scheduled_run, interval, now):
+    """ Get the next run time on the cadence scheduled_run + n * interval,
+    skipping the runs missed before now
+    >>> get_next_run(scheduled_run=100, interval=60, now=130)
+    160
+    >>> get_next_run(scheduled_run=100, interval=60, now=250)
+    280
+    """
+    next_run = scheduled_run + interval
+    if next_run <= now:
+        missed_runs = (now - next_run) // interval + 1
+        next_run += missed_runs * interval
+    return next_run
+
+
+def get_adaptive_interval(
+    quote,
+    target,
+    min_interval,
+    max_interval,
+    far_percent
+):
+    """ Get the polling interval depending on how far the quote is
+    from the target : min_interval when the quote reaches the target,
+    up to max_interval when it is far_percent away (or more)
+    >>> get_adaptive_interval(quote=Amount(real_amount=99, currency="EUR"),\
+    target=Amount(real_amount=100, currency="EUR"),\
+    min_interval=60, max_interval=900, far_percent=5)
+    228.0
+    >>> get_adaptive_interval(quote=Amount(real_amount=80, currency="EUR"),\
+    target=Amount(real_amount=100, currency="EUR"),\
+    min_interval=60, max_interval=900, far_percent=5)
+    900.0
+    """
+    if not target.real_amount:
+        return max_interval
+    distance_percent = abs(
+        quote.real_amount - target.real_amount) / target.real_amount * 100
+    ratio = min(1., distance_percent / far_percent)
+    return min_interval + ratio * (max_interval - min_interval)
+
+
+class TickTimer:
+    """ Class to measure the duration of the phases of a bot tick
+    (ex : history_read, quote, decision, exchange, append),
+    with a monotonic clock """
+    def __init__(self):
+        self.durations = {}  # phase => seconds
+        self._start = time.perf_counter()
+        self.total = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.) + \
+                time.perf_counter() - start
+
+    def stop(self):
+        self.total = time.perf_counter() - self._start
+        return self.total
+
+    def __str__(self):
+        durations = dict(self.durations)
+        if self.total is not None:
+            durations["total"] = self.total
+        return " ".join("{}={:.1f}ms".format(phase, seconds * 1000)
+                        for phase, seconds in durations.items())
+
+
+class TickStats:
+    """ Class to keep the phase durations of the last window ticks
+    of each job, to get their percentiles """
+    def __init__(self, window=_DEFAULT_TIMING_WINDOW):
+        self.window = window
+        self._durations = {}  # name => {phase => deque of seconds}
+        self._lock = threading.Lock()
+
+    def add(self, name, timer):
+        durations = dict(timer.durations)
+        if timer.total is not None:
+            durations["total"] = timer.total
+        with self._lock:
+            phases = self._durations.setdefault(name, {})
+            for phase, seconds in durations.items():
+                phases.setdefault(
+                    phase, collections.deque(maxlen=self.window)
+                ).append(seconds)
+
+    def summary(self, percents=_TIMING_PERCENTS):
+        """ Get the percentiles (in seconds) of each phase of each job :
+        {name: {phase: {"p50": ..., "count": number of ticks}}} """
+        with self._lock:
+            durations = {name: {phase: sorted(values)
+                                for phase, values in phases.items()}
+                         for name, phases in self._durations.items()}
+        return {
+            name: {
+                phase: dict(
+                    [("p{}".format(percent), get_percentile(values, percent))
+                     for percent in percents] + [("count", len(values))])
+                for phase, values in phases.items()
+            }
+            for name, phases in durations.items()
+        }
+
+    def format_summary(self, percents=_TIMING_PERCENTS):
+        lines = []
+        for name, phases in self.summary(percents).items():
+            for phase, stats in phases.items():
+                lines.append("[{}] {} : {} ({} ticks)".format(
+                    name, phase, ", ".join(
+                        "p{} {:.1f}ms".format(
+                            percent, stats["p{}".format(percent)] * 1000)
+                        for percent in percents),
+                    stats["count"]))
+        return "\n".join(lines)
@@ -2,13 +2,16 @@
 # -*- coding: utf-8 -*-
 
 import click
+import contextlib
+import gzip
 import json
 import os
 import sys
 
 from datetime import datetime
 from datetime import timedelta
-from revolut import Revolut, __version__
+from revolut import Revolut, __version__, write_account_transactions_csv
+from revolut.store import TransactionStore
 
 
 @click.command()
@@ -39,8 +42,8 @@ from revolut import Revolut, __version__
 )
 @click.option(
     '--output_format', '-fmt',
-    type=click.Choice(['csv', 'json']),
-    help="output format",
+    type=click.Choice(['csv', 'json', 'ndjson']),
+    help="output format (ndjson : one json transaction per line)",
     default='csv',
 )
 @click.option(
@@ -48,26 +51,106 @@ from revolut import Revolut, __version__
     is_flag=True,
     help='reverse the order of the transactions displayed',
 )
-def main(device_id, token, language, from_date, output_format, reverse):
+@click.option(
+    '--store', '-s',
+    type=click.Path(dir_okay=False),
+    help='SQLite file to keep the transactions locally, '
+         'so that only the new ones are downloaded',
+)
+@click.option(
+    '--workers', '-w',
+    type=click.IntRange(min=1),
+    help='number of time windows downloaded concurrently',
+    default=1,
+)
+@click.option(
+    '--window_days',
+    type=click.IntRange(min=1),
+    help='size of the time windows (in days) when using several workers',
+    default=30,
+)
+@click.option(
+    '--output_file', '-o',
+    type=click.Path(dir_okay=False, writable=True),
+    help='write to this file instead of the standard output '
+         '(gzip compressed if it ends with .gz)',
+)
+def main(device_id, token, language, from_date, output_format, reverse, store,
+         workers, window_days, output_file):
     """ Get the account balances on Revolut """
     if token is None:
         print("You don't seem to have a Revolut token. Use 'revolut_cli' to obtain one")
         exit(1)
 
     rev = Revolut(device_id=device_id, token=token)
-    account_transactions = rev.get_account_transactions(from_date)
-    if output_format == 'csv':
-        print(account_transactions.csv(lang=language, reverse=reverse))
-    elif output_format == 'json':
-        transactions = account_transactions.raw_list
-        if reverse:
-            transactions = reversed(transactions)
-        print(json.dumps(transactions))
+    if store:
+        with TransactionStore(store) as transaction_store:
+            rev.sync_account_transactions(transaction_store, from_date)
+            account_transactions = transaction_store.account_transactions(
+                from_date)
+        raw_transactions = account_transactions.raw_list
+        transactions = account_transactions
+    elif reverse or workers > 1:
+        # The whole history is needed to start from the oldest transaction
+        account_transactions = rev.get_account_transactions(
+            from_date, workers=workers, window=timedelta(days=window_days))
+        raw_transactions = account_transactions.raw_list
+        transactions = account_transactions
     else:
+        # Print the transactions while the next pages are downloaded
+        raw_transactions = rev.iter_raw_account_transactions(from_date)
+        transactions = rev.iter_account_transactions(from_date)
+
+    if output_format not in ['csv', 'json', 'ndjson']:
         print("output format {!r} not implemented".format(output_format))
         exit(1)
 
+    with open_output_file(output_file) as output:
+        if output_format == 'csv':
+            if reverse:
+                transactions = reversed(transactions)
+            write_account_transactions_csv(output, transactions, lang=language)
+        else:
+            if reverse:
+                raw_transactions = reversed(raw_transactions)
+            if output_format == 'json':
+                write_json_list(output, raw_transactions)
+            else:
+                write_ndjson(output, raw_transactions)
+
+
+def open_output_file(output_file):
+    """ Open the output file (text mode), gzip compressed if its name ends
+    with .gz, or use the standard output """
+    if output_file is None:
+        return _stdout()  # Not closed at the end
+    if output_file.endswith('.gz'):
+        return gzip.open(output_file, 'wt', newline='')
+    return open(output_file, 'w', newline='')
+
+
+@contextlib.contextmanager
+def _stdout():
+    # Like contextlib.nullcontext(sys.stdout), which needs Python 3.7
+    yield sys.stdout
+
+
+def write_json_list(output, iterable):
+    """ Same output as print(json.dumps(list(iterable))),
+    without building the whole string """
+    output.write("[")
+    for index, obj in enumerate(iterable):
+        if index:
+            output.write(", ")
+        output.write(json.dumps(obj))
+    output.write("]\n")
+
 
+def write_ndjson(output, iterable):
+    """ Write one json object per line, as they are received """
+    for obj in iterable:
+        output.write(json.dumps(obj))
+        output.write("\n")
 
 if __name__ == "__main__":
     main()
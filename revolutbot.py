@@ -1,18 +1,24 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
+import functools
 import revolut_bot
 import yaml
 import logging
 import os
-import time
+import signal
+import threading
 
+from revolut import QuoteCache
 from revolut import Revolut
 from revolut import Transaction
 from revolut import _DATETIME_FORMAT
 
 
 CONFIG_FILE = 'revolutbot_config.yml'
+_DEFAULT_STAGGER_SEC = 10
+_DEFAULT_MIN_EVERY_SEC = 60
+_DEFAULT_FAR_PERCENT = 5
 
 
 def main():
@@ -33,30 +39,222 @@ def main():
         format='%(levelname)s - %(message)s'
     )
 
-    revolut_client = Revolut(device_id=config['cli_device_id'], token=token)
+    quote_cache = None
+    if config.get('quote_cache_ttl_sec'):
+        quote_cache = QuoteCache(ttl=config['quote_cache_ttl_sec'])
+    revolut_client = Revolut(
+        device_id=config['cli_device_id'],
+        token=token,
+        quote_cache=quote_cache,
+        **config.get('client', {})
+    )
+
+    timing_summary_every_min = config.get('timing_summary_every_min')
+    trade_commodities(
+        revolut_client,
+        get_pairs(config),
+        config.get('stagger_sec', _DEFAULT_STAGGER_SEC),
+        tick_stats=revolut_bot.TickStats(
+            config.get('timing_window', revolut_bot._DEFAULT_TIMING_WINDOW)),
+        timing_summary_every_sec=timing_summary_every_min * 60
+        if timing_summary_every_min else None
+    )
 
-    simulation = config['simulation']['enabled']
+
+def get_pairs(config):
+    """ Get the settings of each commodity pair to trade.
+    The 'pairs' list of the config may override the global settings,
+    which describe the only pair when there is no 'pairs' list.
+    Each pair needs its own history files : a ValueError is raised if a
+    pair has no transaction_file, or if 2 pairs share a history file
+    (the simulation files are only used, and checked, in simulation mode)
+    >>> config = {'data_path': 'data', 'simulation': {'enabled': True},
+    ...           'transaction_file': 'history.csv', 'main_currency': 'EUR',
+    ...           'force_exchange': False, 'percent_margin': 1,
+    ...           'repeat_every_min': 1,
+    ...           'pairs': [{'name': 'BTC'}, {'name': 'ETH'}]}
+    >>> get_pairs(config)
+    Traceback (most recent call last):
+    ...
+    ValueError: The pair BTC has no transaction_file
+    >>> config['pairs'] = [
+    ...     {'name': 'BTC', 'transaction_file': 'btc.csv'},
+    ...     {'name': 'ETH', 'transaction_file': 'eth.csv'}]
+    >>> config['simulation']['transaction_file'] = 'simulation.csv'
+    >>> get_pairs(config)
+    Traceback (most recent call last):
+    ...
+    ValueError: The pairs BTC and ETH share the file data/simulation.csv
+    >>> config['simulation']['enabled'] = False
+    >>> [pair['sm_transaction_filename'] for pair in get_pairs(config)]
+    [None, None]
+    >>> config['simulation']['enabled'] = True
+    >>> config['pairs'][0]['simulation_transaction_file'] = 'simu_btc.csv'
+    >>> config['pairs'][1]['simulation_transaction_file'] = 'simu_eth.csv'
+    >>> [pair['sm_transaction_filename'] for pair in get_pairs(config)]
+    ['data/simu_btc.csv', 'data/simu_eth.csv']
+    """
     data_path = config['data_path']
-    transaction_filename = os.path.join(*[data_path, config['transaction_file']])
-    sm_transaction_filename = None
-    if config['simulation'].get('transaction_file'):
-        sm_transaction_filename = os.path.join(
-            *[data_path, config['simulation']['transaction_file']]
+    pairs = []
+    pair_names_by_filename = {}
+    for pair_config in config.get('pairs', [{}]):
+        if 'pairs' in config and 'transaction_file' not in pair_config:
+            raise ValueError('The pair {} has no transaction_file'.format(
+                pair_config.get('name', len(pairs) + 1)))
+        pair_config = {**config, **pair_config}
+        pair_name = pair_config.get('name', pair_config['transaction_file'])
+        transaction_filename = os.path.join(
+            *[data_path, pair_config['transaction_file']]
         )
-    forceexchange = config['force_exchange']
-    main_currency = config['main_currency']
-    percent_margin = config['percent_margin']
-    repeat_every_min = config['repeat_every_min']
-    trade_commodity(
-        revolut_client,
-        transaction_filename,
-        simulation,
-        sm_transaction_filename,
-        main_currency,
-        forceexchange,
-        percent_margin,
-        repeat_every_min
+        sm_transaction_filename = None
+        sm_transaction_file = None
+        if config['simulation']['enabled']:
+            # Only read in simulation mode
+            sm_transaction_file = pair_config.get(
+                'simulation_transaction_file',
+                config['simulation'].get('transaction_file')
+            )
+        if sm_transaction_file:
+            sm_transaction_filename = os.path.join(
+                *[data_path, sm_transaction_file]
+            )
+        for filename in dict.fromkeys(
+                [transaction_filename, sm_transaction_filename]):
+            if filename is None:
+                continue
+            if filename in pair_names_by_filename:
+                raise ValueError(
+                    'The pairs {} and {} share the file {}'.format(
+                        pair_names_by_filename[filename], pair_name,
+                        filename))
+            pair_names_by_filename[filename] = pair_name
+        pairs.append({
+            'name': pair_name,
+            'transaction_filename': transaction_filename,
+            'simulation': config['simulation']['enabled'],
+            'sm_transaction_filename': sm_transaction_filename,
+            'main_currency': pair_config['main_currency'],
+            'forceexchange': pair_config['force_exchange'],
+            'percent_margin': pair_config['percent_margin'],
+            'repeat_every_min': pair_config['repeat_every_min'],
+            'adaptive_polling': pair_config.get('adaptive_polling'),
+        })
+    return pairs
+
+
+def trade_commodities(
+    revolut_client,
+    pairs,
+    stagger_sec=_DEFAULT_STAGGER_SEC,
+    tick_stats=None,
+    timing_summary_every_sec=None
+):
+    """
+    Monitor several commodity pairs (see trade_commodity) in one process,
+    sharing the same Revolut client.
+    The first checks of the pairs are staggered by stagger_sec seconds,
+    to stay under the rate limits.
+    The durations of the phases of the checks are kept in tick_stats,
+    and their percentiles are logged on SIGUSR1
+    and every timing_summary_every_sec seconds
+    """
+    tick_stats = tick_stats or revolut_bot.TickStats()
+    scheduler = revolut_bot.Scheduler()
+    # Not on Windows, and only from the main thread
+    if hasattr(signal, 'SIGUSR1') and \
+            threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1,
+                      lambda signum, frame: log_timing_summary(tick_stats))
+    if timing_summary_every_sec:
+        scheduler.add_job(
+            functools.partial(log_timing_summary, tick_stats),
+            interval=timing_summary_every_sec,
+            delay=timing_summary_every_sec,
+            name='timing_summary'
+        )
+    for pair_number, pair in enumerate(pairs):
+        history_file = get_history_file(
+            pair['transaction_filename'],
+            pair['simulation'],
+            pair['sm_transaction_filename']
+        )
+        logger = PairLogger(logging.getLogger(), {'pair': pair['name']})
+        tick = functools.partial(
+            trade_commodity_tick,
+            revolut_client,
+            history_file,
+            pair['simulation'],
+            pair['sm_transaction_filename'],
+            pair['main_currency'],
+            pair['forceexchange'],
+            pair['percent_margin'],
+            logger
+        )
+        scheduler.add_job(
+            functools.partial(
+                polling_tick,
+                tick,
+                pair.get('adaptive_polling'),
+                pair['repeat_every_min']*60,
+                logger,
+                tick_stats,
+                pair['name']
+            ),
+            interval=pair['repeat_every_min']*60,
+            delay=pair_number*stagger_sec,
+            name=pair['name']
+        )
+    scheduler.run()
+
+
+def polling_tick(
+    tick,
+    adaptive_polling,
+    repeat_every_sec,
+    logger=logging,
+    tick_stats=None,
+    name=None
+):
+    """ Run the tick, then return the interval before the next one.
+    With adaptive_polling, it is shorter when the quote is close
+    to the price wanted.
+    The durations of the phases of the tick are logged,
+    and added to tick_stats """
+    timer = revolut_bot.TickTimer()
+    commodity_in_main_currency, condition_price_with_margin = tick(
+        timer=timer)
+    timer.stop()
+    logger.debug(f'Tick timings : {timer}')
+    if tick_stats is not None:
+        tick_stats.add(name, timer)
+    if not adaptive_polling:
+        logger.debug(f'Next check in {repeat_every_sec:.0f} seconds\n\n')
+        return repeat_every_sec
+    interval = revolut_bot.get_adaptive_interval(
+        quote=commodity_in_main_currency,
+        target=condition_price_with_margin,
+        min_interval=adaptive_polling.get(
+            'min_every_sec', _DEFAULT_MIN_EVERY_SEC),
+        max_interval=adaptive_polling.get('max_every_sec', repeat_every_sec),
+        far_percent=adaptive_polling.get(
+            'far_percent', _DEFAULT_FAR_PERCENT)
     )
+    logger.debug(f'Next check in {interval:.0f} seconds\n\n')
+    return interval
+
+
+def log_timing_summary(tick_stats):
+    """ Log the percentiles of the durations of the tick phases """
+    summary = tick_stats.format_summary()
+    if summary:
+        logging.info(f'Tick timings (last {tick_stats.window} ticks) :\n'
+                     f'{summary}')
+
+
+class PairLogger(logging.LoggerAdapter):
+    """ Prefix the log messages with the name of the pair """
+    def process(self, msg, kwargs):
+        return '[{}] {}'.format(self.extra['pair'], msg), kwargs
 
 
 def trade_commodity(
@@ -75,93 +273,126 @@ def trade_commodity(
     If during last transaction you have sold commodity - monitor for cheaper offer to buy more;
     If during last transaction you bought commodity - monitor for higher offer to sell it.
     """
+    trade_commodities(revolut_client, [{
+        'name': os.path.basename(transaction_filename),
+        'transaction_filename': transaction_filename,
+        'simulation': simulation,
+        'sm_transaction_filename': sm_transaction_filename,
+        'main_currency': main_currency,
+        'forceexchange': forceexchange,
+        'percent_margin': percent_margin,
+        'repeat_every_min': repeat_every_min,
+    }])
 
-    while True:
-        # If simulation mode enables and simulation file provided
-        # Write/read all transactions from that file
-        if simulation and sm_transaction_filename:
-            filename = sm_transaction_filename
-        elif simulation is False:
-            filename = transaction_filename
-
-        last_transaction = revolut_bot.get_last_transactions_from_csv(
-            filename=filename
-        )[-1]  # Get the last transaction from the list
-
-        # For example: USD(from) to BTC(to)
-        lt_from = last_transaction.from_amount
-        lt_to = last_transaction.to_amount
-
-        #  from_currency = last_tr.from_amount.currency
-        #  to_currency = last_tr.to_amount.currency
-
-        if lt_to.currency != main_currency and lt_from.currency == main_currency:
-            logging.debug(
-                f'Last transaction({last_transaction.date.strftime(_DATETIME_FORMAT)}): '
-                f'Bought {lt_to} '
-                f'for {lt_from}'
-            )
-            action = 'sell'
-            min_max_str = 'minimum'
-            commodity = lt_to
-            last_price = lt_from
-        elif lt_to.currency == main_currency:
-            logging.debug(
-                f'Last transaction({last_transaction.date.strftime(_DATETIME_FORMAT)}): '
-                f'Sold {lt_from} '
-                f'for {lt_to}'
-            )
-            action = 'buy'
-            min_max_str = 'maximum'
-            percent_margin = -percent_margin
-            commodity = lt_from
-            last_price = lt_to
 
-        condition_price_with_margin = revolut_bot.get_amount_with_margin(
-            amount=last_price,
-            percent_margin=percent_margin
+def get_history_file(transaction_filename, simulation, sm_transaction_filename):
+    # If simulation mode enables and simulation file provided
+    # Write/read all transactions from that file
+    if simulation and sm_transaction_filename:
+        filename = sm_transaction_filename
+    else:
+        filename = transaction_filename
+    return revolut_bot.HistoryFile(filename)
+
+
+def trade_commodity_tick(
+    revolut_client,
+    history_file,
+    simulation,
+    sm_transaction_filename,
+    main_currency,
+    forceexchange,
+    percent_margin,
+    logger=logging,
+    timer=None
+):
+    """ Check the commodity price once, and exchange it if the condition
+    is met (see trade_commodity).
+    The phases (history_read, quote, decision, exchange, append) are timed
+    with timer (a TickTimer).
+    Returns the quote of the commodity and the price wanted """
+    timer = timer or revolut_bot.TickTimer()
+    # Only read again if the file was modified by something else
+    with timer.phase('history_read'):
+        last_transaction = history_file.get_last_transaction()
+
+    # For example: USD(from) to BTC(to)
+    lt_from = last_transaction.from_amount
+    lt_to = last_transaction.to_amount
+
+    #  from_currency = last_tr.from_amount.currency
+    #  to_currency = last_tr.to_amount.currency
+
+    if lt_to.currency != main_currency and lt_from.currency == main_currency:
+        logger.debug(
+            f'Last transaction({last_transaction.date.strftime(_DATETIME_FORMAT)}): '
+            f'Bought {lt_to} '
+            f'for {lt_from}'
+        )
+        action = 'sell'
+        min_max_str = 'minimum'
+        commodity = lt_to
+        last_price = lt_from
+    elif lt_to.currency == main_currency:
+        logger.debug(
+            f'Last transaction({last_transaction.date.strftime(_DATETIME_FORMAT)}): '
+            f'Sold {lt_from} '
+            f'for {lt_to}'
         )
+        action = 'buy'
+        min_max_str = 'maximum'
+        percent_margin = -percent_margin
+        commodity = lt_from
+        last_price = lt_to
+
+    with timer.phase('quote'):
         commodity_in_main_currency = revolut_client.quote(
             from_amount=commodity,
             to_currency=main_currency
         )
 
+    with timer.phase('decision'):
+        condition_price_with_margin = revolut_bot.get_amount_with_margin(
+            amount=last_price,
+            percent_margin=percent_margin
+        )
         if action == 'buy':
-            condition_met = commodity_in_main_currency.real_amount < \
-                condition_price_with_margin.real_amount
+            condition_met = \
+                commodity_in_main_currency < condition_price_with_margin
         elif action == 'sell':
-            condition_met = commodity_in_main_currency.real_amount > \
-                condition_price_with_margin.real_amount
+            condition_met = \
+                commodity_in_main_currency > condition_price_with_margin
 
-        logging.debug(
-            f'Looking to {action} {commodity.currency}'
-        )
+    logger.debug(
+        f'Looking to {action} {commodity.currency}'
+    )
 
-        logging.debug(
-            f'Currently({datetime.now().strftime(_DATETIME_FORMAT)}): '
-            f'Same amount of {commodity.currency} is worth {commodity_in_main_currency}'
-        )
-        logging.debug(
-            f'Desired value to {action} same about of {commodity.currency}: '
-            f'{last_price} with margin of {percent_margin}% '
-            f'is {min_max_str} {condition_price_with_margin}'
+    logger.debug(
+        f'Currently({datetime.now().strftime(_DATETIME_FORMAT)}): '
+        f'Same amount of {commodity.currency} is worth {commodity_in_main_currency}'
+    )
+    logger.debug(
+        f'Desired value to {action} same about of {commodity.currency}: '
+        f'{last_price} with margin of {percent_margin}% '
+        f'is {min_max_str} {condition_price_with_margin}'
+    )
+    logger.debug(f'CONDITION MET - {condition_met}')
+
+    simulate_str = '| simulating' if simulation else ''
+    sign = '>' if action == 'buy' else '<'
+    #  condition_met = True # TODO: REMOVE!
+    if condition_met or forceexchange:
+        if forceexchange:
+            logger.info('[ATTENTION] Force exchange option enabled')
+        logger.debug(
+            f'Action: '
+            f'{condition_price_with_margin} {sign} {commodity_in_main_currency} '
+            f'====> {action.upper()}ING {commodity.currency} {simulate_str}'
         )
-        logging.debug(f'CONDITION MET - {condition_met}')
-
-        simulate_str = '| simulating' if simulation else ''
-        sign = '>' if action == 'buy' else '<'
-        #  condition_met = True # TODO: REMOVE!
-        if condition_met or forceexchange:
-            if forceexchange:
-                logging.info('[ATTENTION] Force exchange option enabled')
-            logging.debug(
-                f'Action: '
-                f'{condition_price_with_margin} {sign} {commodity_in_main_currency} '
-                f'====> {action.upper()}ING {commodity.currency} {simulate_str}'
-            )
 
-            if forceexchange or simulation is False or (simulation and sm_transaction_filename):
-                # TODO rewrite to return a real object for simulation
+        if forceexchange or simulation is False or (simulation and sm_transaction_filename):
+            # TODO rewrite to return a real object for simulation
+            with timer.phase('exchange'):
                 if forceexchange and simulation is False:
                     # Real transaction
                     exchange_transaction = revolut_client.exchange(
@@ -179,26 +410,23 @@ def trade_commodity(
                         to_amount=exchanged_amount,
                         date=datetime.now()
                     )
-                logging.info(
-                    f'Just({datetime.now().strftime(_DATETIME_FORMAT)}) '
-                    f'{action.upper()}ED {exchange_transaction.to_amount} '
-                    f'{simulate_str}'
-                )
-                logging.debug(
-                    f'Updating history file : {filename}'
-                )
-                revolut_bot.update_historyfile(
-                    filename=filename,
-                    exchange_transaction=exchange_transaction
-                )
-        else:
-            logging.debug(
-                f'Action: '
-                f'{commodity_in_main_currency} {sign} {condition_price_with_margin} '
-                f'====> NOT {action.upper()}ING {commodity.currency} {simulate_str}'
+            logger.info(
+                f'Just({datetime.now().strftime(_DATETIME_FORMAT)}) '
+                f'{action.upper()}ED {exchange_transaction.to_amount} '
+                f'{simulate_str}'
+            )
+            logger.debug(
+                f'Updating history file : {history_file.filename}'
             )
-        logging.debug(f'Sleeping for {repeat_every_min} minutes\n\n')
-        time.sleep(repeat_every_min*60)
+            with timer.phase('append'):
+                history_file.add_transaction(exchange_transaction)
+    else:
+        logger.debug(
+            f'Action: '
+            f'{commodity_in_main_currency} {sign} {condition_price_with_margin} '
+            f'====> NOT {action.upper()}ING {commodity.currency} {simulate_str}'
+        )
+    return commodity_in_main_currency, condition_price_with_margin
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from revolut import Revolut, _URL_GET_TRANSACTIONS_LAST
+
+
+class FakeClient:
+    """ Replays the pagination of /user/current/transactions/last
+    over an in-memory history, without any network """
+    page_size = 3
+
+    def __init__(self, raw_transactions):
+        # The API returns the most recent transactions first
+        self.raw_transactions = sorted(raw_transactions,
+                                       key=lambda t: -t["startedDate"])
+        self.calls = []
+
+    def _get_json(self, url, *, params=None, **kwargs):
+        assert url == _URL_GET_TRANSACTIONS_LAST
+        params = dict(params or {})
+        self.calls.append(params)
+        page = [
+            t for t in self.raw_transactions
+            if t["startedDate"] < params.get("to", float("inf")) and
+            t["startedDate"] >= params.get("from", 0)
+        ][:self.page_size]
+        return page
+
+
+def make_raw_transaction(index, state="COMPLETED", currency="EUR"):
+    started_date = 1570000000000 + index * 3600 * 1000
+    return {
+        "id": "id{}".format(index),
+        "type": "CARD_PAYMENT",
+        "state": state,
+        "startedDate": started_date,
+        "completedDate": started_date + 1000,
+        "amount": -100 * index,
+        "fee": 0,
+        "currency": currency,
+        "description": "Shop {}".format(index),
+        "account": {"id": "account_id"},
+    }
+
+
+@pytest.fixture
+def raw_history():
+    return [make_raw_transaction(index) for index in range(10)]
+
+
+@pytest.fixture
+def fake_revolut(raw_history):
+    revolut = Revolut(token="fake_token", device_id="fake_device")
+    revolut.client = FakeClient(raw_history)
+    return revolut
+
+
+class StubServer(socketserver.ThreadingMixIn, HTTPServer):
+    """ Local HTTP server answering with the functions of self.routes :
+    {(method, path): function(params, body) => (status, json_obj, headers)}
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.routes = {}
+        self.requests = []
+        self.api_base = "http://127.0.0.1:{}".format(self.server_address[1])
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _answer(self, method):
+        url = urlparse(self.path)
+        params = {key: values[0]
+                  for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        self.server.requests.append((method, url.path, self.headers))
+        route = self.server.routes.get((method, url.path))
+        if route is None:
+            status, json_obj, headers = 404, {"message": "not found"}, {}
+        else:
+            status, json_obj, headers = route(params, body)
+        # No body for the None responses (ex : 304 Not Modified)
+        body = b"" if json_obj is None else json.dumps(json_obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._answer("GET")
+
+    def do_POST(self):
+        self._answer("POST")
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,38 @@
+from revolut import Accounts
+
+# To be tested with : python -m pytest -vs test/test_revolut_accounts.py
+
+
+def get_account_dicts():
+    return [{"balance": 10000, "currency": "EUR",
+             "type": "CURRENT", "vault_name": "", "state": "ACTIVE"},
+            {"balance": 550, "currency": "USD",
+             "type": "CURRENT", "vault_name": "", "state": "ACTIVE"},
+            {"balance": 0, "currency": "GBP", "vault_name": "",
+             "type": "CURRENT", "state": "INACTIVE"},
+            {"balance": 1000000, "currency": "BTC",
+             "type": "CURRENT", "vault_name": "", "state": "ACTIVE"},
+            {"balance": 1000, "currency": "EUR",
+             "vault_name": "My vault",
+             "type": "SAVINGS", "state": "ACTIVE"}]
+
+
+def test_accounts_indexes():
+    accounts = Accounts(get_account_dicts())
+    assert [str(account.balance) for account in accounts.get_accounts(
+        currency="EUR", state="ACTIVE")] == ["100.00 EUR", "10.00 EUR"]
+    assert accounts.get_accounts(account_type="SAVINGS", currency="USD") == []
+    assert len(accounts.active()) == 4
+    assert list(accounts.by_currency()) == ["EUR", "USD", "GBP", "BTC"]
+
+
+def test_accounts_diff():
+    account_dicts = get_account_dicts()
+    accounts = Accounts(account_dicts)
+    account_dicts[0] = dict(account_dicts[0], balance=12000)
+    account_dicts.pop()
+    changes = accounts.diff(Accounts(account_dicts))
+    assert [(name, str(old), str(new)) for name, (old, new)
+            in changes.items()] == [
+        ("EUR CURRENT", "100.00 EUR", "120.00 EUR"),
+        ("EUR SAVINGS (My vault)", "10.00 EUR", "None")]
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+from revolut import Accounts, AccountTransactions, Amount, Transaction
+
+from conftest import make_raw_transaction
+
+aio = pytest.importorskip("revolut.aio")
+pytest.importorskip("aiohttp")
+
+# To be tested with : python -m pytest -vs test/test_revolut_aio.py
+
+_WALLET = {"id": "wallet_id", "pockets": [
+    {"balance": 10000, "currency": "EUR", "type": "CURRENT",
+     "state": "ACTIVE"},
+    {"balance": 1000, "currency": "EUR", "type": "SAVINGS",
+     "state": "ACTIVE", "name": "My vault"},
+]}
+_HISTORY = [make_raw_transaction(index) for index in reversed(range(5))]
+
+
+def run_coroutine(coroutine):
+    # Like asyncio.run, which needs Python 3.7
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@pytest.fixture
+def api_base(stub_server):
+    def transactions(params, body):
+        to = int(params.get("to", 1e16))
+        return 200, [t for t in _HISTORY if t["startedDate"] < to][:2], {}
+
+    stub_server.routes = {
+        ("GET", "/user/current/wallet"): lambda params, body: (
+            200, _WALLET, {}),
+        ("GET", "/user/current/transactions/last"): transactions,
+        ("GET", "/quote/EURBTC"): lambda params, body: (
+            200, {"to": {"amount": int(params["amount"]) * 20}}, {}),
+    }
+    return stub_server.api_base
+
+
+def test_async_revolut(api_base):
+    async def run():
+        async with aio.AsyncRevolut(token="fake_token",
+                                    device_id="fake_device",
+                                    api_base=api_base) as revolut:
+            one_euro = Amount(real_amount=1, currency="EUR")
+            return await asyncio.gather(
+                revolut.get_account_balances(),
+                revolut.get_account_transactions(),
+                revolut.get_wallet_id(),
+                *[revolut.quote(one_euro, "BTC") for _ in range(20)],
+                revolut.exchange(one_euro, "BTC", simulate=True),
+            )
+
+    ret = run_coroutine(run())
+    accounts, transactions, wallet_id = ret[:3]
+    quotes, exchange_transaction = ret[3:-1], ret[-1]
+
+    assert type(accounts) == Accounts
+    assert accounts[1].name == "EUR SAVINGS (My vault)"
+    assert type(transactions) == AccountTransactions
+    assert transactions.raw_list == _HISTORY
+    assert wallet_id == "wallet_id"
+    assert str(quotes[0]) == "0.00002000 BTC"
+    assert type(exchange_transaction) == Transaction
+
+
+def test_async_revolut_errors(api_base):
+    async def run():
+        async with aio.AsyncRevolut(token="fake_token",
+                                    device_id="fake_device",
+                                    api_base=api_base) as revolut:
+            await revolut.quote(Amount(real_amount=1, currency="USD"), "BTC")
+
+    with pytest.raises(ConnectionError):
+        run_coroutine(run())
+
+
+def test_async_revolut_json_loads(api_base):
+    decoded = []
+
+    def json_loads(content):
+        decoded.append(content)
+        return json.loads(content)
+
+    async def run():
+        async with aio.AsyncRevolut(token="fake_token",
+                                    device_id="fake_device",
+                                    api_base=api_base,
+                                    json_loads=json_loads) as revolut:
+            return await revolut.get_wallet_id()
+
+    assert run_coroutine(run()) == "wallet_id"
+    assert decoded == [json.dumps(_WALLET).encode()]
@@ -0,0 +1,84 @@
+import io
+import json
+
+import pytest
+from revolut import AccountTransactions
+from revolut.archive import (
+    TransactionArchive, convert_export, load_archive, save_archive)
+
+from conftest import make_raw_transaction
+
+# To be tested with : python -m pytest -vs test/test_revolut_archive.py
+
+
+@pytest.fixture
+def archive_filename(tmp_path):
+    raw_transactions = [make_raw_transaction(index) for index in range(10)]
+    raw_transactions[3]["completedDate"] = None
+    raw_transactions[4]["description"] = "Café"
+    # Not sorted, like the results of several requests
+    raw_transactions = raw_transactions[5:] + raw_transactions[:5]
+    filename = str(tmp_path / "transactions.rvta")
+    assert save_archive(filename, raw_transactions) == 10
+    return filename
+
+
+def test_archive(archive_filename):
+    with TransactionArchive(archive_filename) as archive:
+        assert len(archive) == 10
+        assert archive.first_started_date == \
+            make_raw_transaction(0)["startedDate"]
+        assert archive.get_raw(9) == make_raw_transaction(9)
+        assert archive.get_raw(3)["completedDate"] is None
+        assert archive[4].description == "Café"
+        assert archive[-1].amount.revolut_amount == -900
+
+        # Range search (both dates included)
+        from_date = make_raw_transaction(2)["startedDate"]
+        to_date = make_raw_transaction(4)["startedDate"]
+        assert archive.get_indexes(from_date, to_date) == range(2, 5)
+        assert archive.get_indexes(to_date=from_date - 1) == range(0, 2)
+        assert archive.get_indexes(from_date=to_date, to_date=from_date) \
+            == range(4, 4)
+        assert [t["startedDate"] for t in archive.get_raw_transactions(
+            from_date=to_date)][-1] == to_date
+
+    account_transactions = load_archive(archive_filename)
+    assert type(account_transactions) == AccountTransactions
+    assert [t.description for t in account_transactions][:2] == [
+        "Shop 9", "Shop 8"]
+
+
+def test_archive_errors(tmp_path):
+    filename = tmp_path / "transactions.json"
+    filename.write_text("[]" + " " * 100)
+    with pytest.raises(ValueError):
+        TransactionArchive(str(filename))
+
+
+def test_convert_export(tmp_path):
+    # Most recent first, like the Revolut API
+    raw_transactions = [make_raw_transaction(index)
+                        for index in reversed(range(3))]
+    raw_transactions[0]["state"] = "PENDING"
+    json_filename = tmp_path / "transactions.json"
+    json_filename.write_text(json.dumps(raw_transactions))
+    archive_filename = str(tmp_path / "transactions.rvta")
+    assert convert_export(str(json_filename), archive_filename) == 3
+    assert load_archive(archive_filename).raw_list == raw_transactions
+
+    # The csv exports only have some of the fields
+    csv_filename = tmp_path / "transactions.csv"
+    with open(str(csv_filename), "w", newline="") as f:
+        f.write(AccountTransactions(raw_transactions).csv())
+    assert convert_export(str(csv_filename), archive_filename) == 3
+    account_transactions = load_archive(archive_filename)
+    csv_file = io.StringIO()
+    account_transactions.write_csv(csv_file)
+    assert csv_file.getvalue().rstrip("\n") == \
+        AccountTransactions(raw_transactions).csv()
+    assert account_transactions[0].state == "PENDING"
+    assert account_transactions[0].description == "Shop 2"
+
+    with pytest.raises(ValueError):
+        convert_export(str(tmp_path / "transactions.xls"), archive_filename)
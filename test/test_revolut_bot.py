@@ -3,6 +3,8 @@ from revolut import Amount, Transaction
 from datetime import datetime
 import pytest
 import os
+import threading
+import time
 
 # To be tested with : python -m pytest -vs test/test_revolut_bot.py
 
@@ -121,3 +123,151 @@ def test_convert_Transaction_to_dict():
                        'hour': '16:30:00',
                        'to_amount': 8.66,
                        'to_currency': 'EUR'}
+
+
+def test_get_last_transaction_from_csv(tmp_path):
+    filename = str(tmp_path / "history.csv")
+    with open(filename, "w") as f:
+        f.write("date,hour,from_amount,from_currency,to_amount,to_currency\n")
+    with pytest.raises(IndexError):
+        revolut_bot.get_last_transaction_from_csv(filename=filename)
+
+    transaction = Transaction(
+                    from_amount=Amount(real_amount=10, currency="USD"),
+                    to_amount=Amount(real_amount=8.66, currency="EUR"),
+                    date=datetime.strptime("10/07/18 16:30", "%d/%m/%y %H:%M"))
+    revolut_bot.update_historyfile(filename, transaction)
+    last_tr = revolut_bot.get_last_transaction_from_csv(filename=filename)
+    assert str(last_tr) == str(transaction)
+
+    # Longer than the blocks read from the end of the file
+    for _ in range(1000):
+        revolut_bot.update_historyfile(filename, transaction)
+    revolut_bot.update_historyfile(filename, Transaction(
+                    from_amount=Amount(real_amount=8.66, currency="EUR"),
+                    to_amount=Amount(real_amount=10.5, currency="USD"),
+                    date=datetime.strptime("11/07/18 10:00", "%d/%m/%y %H:%M")))
+    last_tr = revolut_bot.get_last_transaction_from_csv(filename=filename)
+    assert last_tr.to_amount.real_amount == 10.5
+    assert last_tr.date == datetime(2018, 7, 11, 10, 0)
+
+    last_transactions = revolut_bot.get_last_transactions_from_csv(
+                        filename=filename)
+    assert str(last_transactions[-1]) == str(last_tr)
+
+    with pytest.raises(TypeError):
+        revolut_bot.get_last_transaction_from_csv(filename=filename,
+                                                  separator=";")
+
+
+def test_history_file(tmp_path, monkeypatch):
+    filename = str(tmp_path / "history.csv")
+    with open(filename, "w") as f:
+        f.write("date,hour,from_amount,from_currency,to_amount,to_currency\n")
+        f.write("01/01/2018,09:00:00,100.00,USD,86.66,EUR\n")
+    history_file = revolut_bot.HistoryFile(filename)
+    assert history_file.get_last_transaction().to_amount.currency == "EUR"
+
+    reads = []
+    get_last_transaction_from_csv = revolut_bot.get_last_transaction_from_csv
+
+    def counted_get_last_transaction_from_csv(**kwargs):
+        reads.append(kwargs)
+        return get_last_transaction_from_csv(**kwargs)
+
+    monkeypatch.setattr(revolut_bot, "get_last_transaction_from_csv",
+                        counted_get_last_transaction_from_csv)
+
+    transaction = Transaction(
+                    from_amount=Amount(real_amount=86.66, currency="EUR"),
+                    to_amount=Amount(real_amount=102, currency="USD"),
+                    date=datetime.strptime("05/01/18 19:00", "%d/%m/%y %H:%M"))
+    history_file.add_transaction(transaction)
+    assert history_file.get_last_transaction() is transaction
+    assert reads == []
+
+    # Modified by something else
+    with open(filename, "a") as f:
+        f.write("06/01/2018,10:00:00,102.00,USD,80.00,EUR\n")
+    assert history_file.get_last_transaction().to_amount.real_amount == 80
+    assert len(reads) == 1
+
+
+def test_scheduler():
+    runs = {"slow": 0, "fast": 0, "failing": 0}
+
+    def slow():
+        runs["slow"] += 1
+        time.sleep(0.5)
+
+    def fast():
+        runs["fast"] += 1
+
+    def failing():
+        runs["failing"] += 1
+        raise RuntimeError("This job should not stop the others")
+
+    scheduler = revolut_bot.Scheduler()
+    scheduler.add_job(slow, interval=0.01)
+    scheduler.add_job(fast, interval=0.01, delay=0.05)
+    scheduler.add_job(failing, interval=0.01)
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    time.sleep(0.3)
+    scheduler.stop()
+    thread.join()
+    assert runs["slow"] == 1
+    assert runs["fast"] > 5
+    assert runs["failing"] > 5
+
+
+def test_scheduler_cadence():
+    scheduled_runs = []
+    intervals = []
+
+    class RecordingScheduler(revolut_bot.Scheduler):
+        def _run_job(self, job, scheduled_run):
+            scheduled_runs.append(scheduled_run)
+            super()._run_job(job, scheduled_run)
+
+    def job():
+        time.sleep(0.02)  # Should not delay the next runs
+        intervals.append(0.05 if len(intervals) < 2 else 0.1)  # Adaptive
+        return intervals[-1]
+
+    scheduler = RecordingScheduler()
+    scheduler.add_job(job, interval=1)
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    time.sleep(0.33)
+    scheduler.stop()
+    thread.join()
+    assert len(scheduled_runs) >= 3
+    # The runs stay on the cadence given by the previous run (a late run,
+    # or a missed one under load, does not shift the next runs)
+    for previous_run, next_run, interval in zip(
+            scheduled_runs, scheduled_runs[1:], intervals):
+        runs = (next_run - previous_run) / interval
+        assert round(runs) >= 1
+        assert runs == pytest.approx(round(runs), abs=1e-6)
+
+
+def test_tick_timings():
+    tick_stats = revolut_bot.TickStats(window=3)
+    for duration in [0.01, 0.02, 0.03, 0.04]:
+        timer = revolut_bot.TickTimer()
+        with timer.phase("quote"):
+            time.sleep(duration)
+        with timer.phase("decision"):
+            pass
+        timer.stop()
+        tick_stats.add("BTC", timer)
+    assert "quote=" in str(timer) and "total=" in str(timer)
+
+    summary = tick_stats.summary()
+    assert list(summary["BTC"]) == ["quote", "decision", "total"]
+    # Only the last 3 ticks are kept
+    assert summary["BTC"]["quote"]["count"] == 3
+    assert summary["BTC"]["quote"]["p50"] == pytest.approx(0.03, abs=0.01)
+    assert summary["BTC"]["quote"]["p99"] == pytest.approx(0.04, abs=0.01)
+    assert tick_stats.format_summary().startswith("[BTC] quote : p50 ")
@@ -0,0 +1,147 @@
+import json
+
+import pytest
+import requests
+import yaml
+from revolut import (
+    Client, RequestMetrics, _URL_EXCHANGE, _URL_GET_ACCOUNTS, _URL_QUOTE)
+
+# To be tested with : python -m pytest -vs test/test_revolut_client.py
+
+
+def get_client(stub_server, **kwargs):
+    return Client(token="fake_token", device_id="fake_device",
+                  api_base=stub_server.api_base, backoff_factor=0.01,
+                  **kwargs)
+
+
+def test_client_retry(stub_server):
+    statuses = [503, 429, 200]
+
+    def wallet(params, body):
+        return statuses.pop(0), {"id": "wallet_id"}, {"Retry-After": "0"}
+
+    stub_server.routes[("GET", "/user/current/wallet")] = wallet
+    client = get_client(stub_server)
+    assert client._get(_URL_GET_ACCOUNTS).json() == {"id": "wallet_id"}
+    assert len(stub_server.requests) == 3
+
+
+def test_client_retry_errors(stub_server):
+    stub_server.routes[("GET", "/user/current/wallet")] = \
+        lambda params, body: (503, {}, {})
+    with pytest.raises(ConnectionError):
+        get_client(stub_server, max_retries=2)._get(_URL_GET_ACCOUNTS)
+    assert len(stub_server.requests) == 3
+
+    # Do not wait longer than backoff_max
+    stub_server.requests = []
+    stub_server.routes[("GET", "/user/current/wallet")] = \
+        lambda params, body: (429, {}, {"Retry-After": "3600"})
+    with pytest.raises(ConnectionError):
+        get_client(stub_server)._get(_URL_GET_ACCOUNTS)
+    assert len(stub_server.requests) == 1
+
+    # An exchange is never retried
+    stub_server.requests = []
+    stub_server.routes[("POST", "/exchange")] = \
+        lambda params, body: (503, {}, {})
+    with pytest.raises(ConnectionError):
+        get_client(stub_server)._post(_URL_EXCHANGE, json={})
+    assert len(stub_server.requests) == 1
+
+
+def test_client_keep_alive(stub_server):
+    stub_server.routes[("GET", "/user/current/wallet")] = \
+        lambda params, body: (200, {}, {})
+    get_client(stub_server, keep_alive=False)._get(_URL_GET_ACCOUNTS)
+    assert stub_server.requests[0][2]["Connection"] == "close"
+
+
+def test_client_yaml_options(stub_server):
+    # Like the 'client' settings of revolutbot_config.yml
+    options = yaml.safe_load("""
+pool_size: 4
+keep_alive: True
+timeout: [5, 30]
+max_retries: 1
+""")
+    stub_server.routes[("GET", "/user/current/wallet")] = \
+        lambda params, body: (200, {"id": "wallet_id"}, {})
+    client = get_client(stub_server, **options)
+    assert client.timeout == (5, 30)
+    assert client._get_json(_URL_GET_ACCOUNTS) == {"id": "wallet_id"}
+
+
+def test_client_response_cache(stub_server):
+    def wallet(params, body):
+        headers = stub_server.requests[-1][2]
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, None, {"ETag": '"v1"'}
+        return 200, {"id": "wallet_id"}, {"ETag": '"v1"'}
+
+    stub_server.routes[("GET", "/user/current/wallet")] = wallet
+    stub_server.routes[("GET", "/quote/EURUSD")] = \
+        lambda params, body: (200, {"to": {"amount": 115}}, {})
+    client = get_client(stub_server,
+                        cached_endpoints=["/user/current/wallet", "/quote/"])
+    first = client._get_json(_URL_GET_ACCOUNTS)
+    assert client._get_json(_URL_GET_ACCOUNTS) is first
+    assert "If-None-Match" not in stub_server.requests[0][2]
+
+    # Without validators, the same body is not parsed again
+    quote_url = _URL_QUOTE + "EURUSD"
+    first = client._get_json(quote_url, params={"amount": 100})
+    assert client._get_json(quote_url, params={"amount": 100}) is first
+    assert client._get_json(quote_url, params={"amount": 200}) is not first
+    assert client.response_cache.stats() == {
+        "not_modified": 1, "unchanged": 1, "misses": 3, "size": 3}
+
+    # Not cached by default
+    client = get_client(stub_server)
+    assert client._get_json(_URL_GET_ACCOUNTS) == {"id": "wallet_id"}
+    assert len(client.response_cache) == 0
+
+
+def test_client_json_loads(stub_server):
+    stub_server.routes[("GET", "/user/current/wallet")] = \
+        lambda params, body: (200, {"id": "wallet_id"}, {})
+    decoded = []
+
+    def json_loads(content):
+        decoded.append(content)
+        return json.loads(content)
+
+    client = get_client(stub_server, json_loads=json_loads)
+    assert client._get_json(_URL_GET_ACCOUNTS) == {"id": "wallet_id"}
+    assert decoded == [b'{"id": "wallet_id"}']
+
+
+def test_client_metrics(stub_server):
+    statuses = [503, 200]
+    stub_server.routes[("GET", "/quote/EURUSD")] = lambda params, body: (
+        statuses.pop(0), {"to": {"amount": 115}}, {"Retry-After": "0"})
+    responses = []
+    metrics = RequestMetrics()
+    client = get_client(
+        stub_server, metrics=metrics,
+        on_response=lambda method, endpoint, url, response, seconds, e:
+        responses.append((method, endpoint, response.status_code)))
+    client._get(_URL_QUOTE + "EURUSD?amount=100")
+    assert responses == [("GET", "/quote/{pair}", 503),
+                         ("GET", "/quote/{pair}", 200)]
+    assert metrics.requests == {("GET", "/quote/{pair}", "503"): 1,
+                                ("GET", "/quote/{pair}", "200"): 1}
+    assert metrics.bytes[("GET", "/quote/{pair}", "received")] == \
+        2 * len('{"to": {"amount": 115}}')
+    assert metrics.latencies[("GET", "/quote/{pair}", "error")][-1] == 1
+    prometheus = metrics.to_prometheus()
+    assert 'revolut_request_duration_seconds_count{method="GET",' \
+        'endpoint="/quote/{pair}",outcome="success"} 1' in prometheus
+
+    # A request which raised an exception
+    with pytest.raises(requests.ConnectionError):
+        get_client(stub_server, metrics=metrics, max_retries=0)._get(
+            "http://127.0.0.1:1/user/current/wallet")
+    assert metrics.requests[
+        ("GET", "/user/current/wallet", "ConnectionError")] == 1
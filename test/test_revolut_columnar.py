@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+from revolut import AccountTransaction
+from revolut import columnar
+from revolut.columnar import ColumnarTransactions
+
+from conftest import make_raw_transaction
+
+# To be tested with : python -m pytest -vs test/test_revolut_columnar.py
+
+
+@pytest.fixture(params=["python", "numpy"])
+def columnar_transactions(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(columnar, "numpy", None)
+    raw_transactions = [
+        make_raw_transaction(0, currency="USD"),
+        make_raw_transaction(1, state="PENDING"),
+        make_raw_transaction(2),
+        make_raw_transaction(3, state="DECLINED"),
+    ]
+    raw_transactions[1]["completedDate"] = None
+    return ColumnarTransactions(raw_transactions)
+
+
+def test_columnar_rows(columnar_transactions):
+    assert len(columnar_transactions) == 4
+    assert len(columnar_transactions.currencies) == 2
+    transaction = columnar_transactions[1]
+    assert type(transaction) == AccountTransaction
+    assert transaction.completed_date is None
+    assert transaction.get_description() == "Shop 1 **pending**"
+    assert columnar_transactions.get_raw(2) == make_raw_transaction(2)
+    assert [t.description for t in columnar_transactions] == [
+        "Shop 0", "Shop 1", "Shop 2", "Shop 3"]
+
+
+def test_columnar_filters(columnar_transactions):
+    assert columnar_transactions.where(state="COMPLETED") == [0, 2]
+    assert columnar_transactions.where(state="COMPLETED",
+                                       currency="EUR") == [2]
+    assert columnar_transactions.where(currency="GBP") == []
+    from_date = datetime.fromtimestamp(
+        make_raw_transaction(1)["startedDate"] / 1000)
+    to_date = datetime.fromtimestamp(
+        make_raw_transaction(2)["startedDate"] / 1000)
+    assert columnar_transactions.where(from_date=from_date,
+                                       to_date=to_date) == [1, 2]
+
+    sums = columnar_transactions.sum_amounts()
+    assert str(sums["EUR"]) == "-6.00 EUR"
+    assert str(sums["USD"]) == "0.00 USD"
+    sums = columnar_transactions.sum_amounts(
+        columnar_transactions.where(currency="EUR", state="PENDING"))
+    assert list(sums) == ["EUR"]
+    assert str(sums["EUR"]) == "-1.00 EUR"
+
+    subset = columnar_transactions.take([2, 3])
+    assert len(subset) == 2
+    assert subset.where(state="DECLINED") == [1]
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+from revolut import Amount, Revolut
+from revolut.fake_server import FakeRevolutServer
+
+# To be tested with : python -m pytest -vs test/test_revolut_fake_server.py
+
+
+def get_revolut(server, **kwargs):
+    return Revolut(token="fake_token", device_id="fake_device",
+                   api_base=server.api_base, **kwargs)
+
+
+def test_fake_server():
+    with FakeRevolutServer(history_size=25, page_size=10,
+                           balances={"EUR": 1000}) as server:
+        revolut = get_revolut(server, wallet_cache_ttl=0)
+        account_transactions = revolut.get_account_transactions()
+        assert len(account_transactions) == 25
+        assert account_transactions.raw_list == server.history
+        assert len(revolut.get_account_transactions(
+            from_date=datetime.fromtimestamp(
+                account_transactions[4].started_date / 1000))) == 5
+
+        assert str(revolut.quote(Amount(real_amount=10, currency="EUR"),
+                                 "USD")) == "11.11 USD"
+        transaction = revolut.exchange(
+            Amount(real_amount=8, currency="EUR"), "BTC")
+        assert str(transaction.to_amount) == "0.00100000 BTC"
+        accounts = revolut.get_account_balances()
+        assert str(accounts.get_account_by_name("EUR CURRENT").balance) == \
+            "2.00 EUR"
+        with pytest.raises(ConnectionError):  # Not enough EUR
+            revolut.exchange(Amount(real_amount=8, currency="EUR"), "BTC")
+
+
+def test_fake_server_errors():
+    with FakeRevolutServer(error_rate=1.) as server:
+        with pytest.raises(ConnectionError):
+            get_revolut(server, max_retries=0).get_wallet_id()
+
+    with FakeRevolutServer(rate_limit=2) as server:
+        revolut = get_revolut(server, wallet_cache_ttl=0, max_retries=0)
+        revolut.get_wallet_id()
+        revolut.get_wallet_id()
+        with pytest.raises(ConnectionError) as e:
+            revolut.get_wallet_id()
+        assert "429" in str(e.value)
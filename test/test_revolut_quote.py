@@ -0,0 +1,70 @@
+import pytest
+from revolut import Amount, QuoteCache, Revolut
+
+# To be tested with : python -m pytest -vs test/test_revolut_quote.py
+
+
+@pytest.fixture
+def quote_server(stub_server):
+    # 1 EUR = 1.15 USD
+    stub_server.routes[("GET", "/quote/EURUSD")] = lambda params, body: (
+        200, {"to": {"amount": int(params["amount"]) * 115 // 100}}, {})
+    return stub_server
+
+
+def test_quote_cache(quote_server):
+    revolut = Revolut(token="fake_token", device_id="fake_device",
+                      api_base=quote_server.api_base,
+                      quote_cache=QuoteCache(ttl=60, maxsize=1))
+    quote = revolut.quote(Amount(real_amount=10, currency="EUR"), "USD")
+    assert str(quote) == "11.50 USD"
+    quote = revolut.quote(Amount(real_amount=20, currency="EUR"), "USD")
+    assert str(quote) == "23.00 USD"
+    assert len(quote_server.requests) == 1
+    assert revolut.quote_cache.stats() == {
+        "hits": 1, "misses": 1, "hit_ratio": 0.5, "size": 1}
+
+    # Least recently used pair evicted
+    revolut.quote_cache.set(Amount(real_amount=1, currency="EUR"),
+                            Amount(real_amount=1, currency="GBP"))
+    assert len(revolut.quote_cache) == 1
+    revolut.quote(Amount(real_amount=20, currency="EUR"), "USD")
+    assert len(quote_server.requests) == 2
+
+
+def test_quote_cache_ttl(quote_server):
+    revolut = Revolut(token="fake_token", device_id="fake_device",
+                      api_base=quote_server.api_base,
+                      quote_cache=QuoteCache(ttl=0))
+    for _ in range(2):
+        revolut.quote(Amount(real_amount=10, currency="EUR"), "USD")
+    assert len(quote_server.requests) == 2
+
+
+def test_quote_many(quote_server):
+    revolut = Revolut(token="fake_token", device_id="fake_device",
+                      api_base=quote_server.api_base)
+    ten_euros = Amount(real_amount=10, currency="EUR")
+    quotes = revolut.quote_many([
+        (ten_euros, "USD"),
+        (Amount(real_amount=20, currency="EUR"), "USD"),
+        (Amount(real_amount=10, currency="EUR"), "USD"),
+        (ten_euros, "UNKNOWN"),
+        (ten_euros, "GBP"),
+    ], workers=4)
+    assert [str(quote) for quote in quotes[:3]] == [
+        "11.50 USD", "23.00 USD", "11.50 USD"]
+    assert type(quotes[3]) == KeyError
+    assert type(quotes[4]) == ConnectionError
+    # The duplicate and invalid requests were not sent
+    assert len(quote_server.requests) == 3
+
+    # The malformed requests don't fail the whole batch
+    quotes = revolut.quote_many([
+        (ten_euros, "USD"),
+        None,
+        (ten_euros,),
+        (ten_euros, ["USD"]),
+    ])
+    assert str(quotes[0]) == "11.50 USD"
+    assert [type(quote) for quote in quotes[1:]] == [TypeError] * 3
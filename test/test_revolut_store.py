@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+from revolut import AccountTransactions
+from revolut.store import TransactionStore
+
+from conftest import make_raw_transaction
+
+# To be tested with : python -m pytest -vs test/test_revolut_store.py
+
+
+def test_store_upsert():
+    store = TransactionStore()
+    assert len(store) == 0
+    assert store.last_started_date() is None
+
+    store.upsert([make_raw_transaction(1, state="PENDING"),
+                  make_raw_transaction(2)])
+    store.upsert([make_raw_transaction(1)])
+    assert len(store) == 2
+    assert store.last_started_date() == make_raw_transaction(2)["startedDate"]
+
+    account_transactions = store.account_transactions()
+    assert type(account_transactions) == AccountTransactions
+    assert [t["id"] for t in account_transactions.raw_list] == ["id2", "id1"]
+    assert account_transactions.raw_list[1]["state"] == "COMPLETED"
+
+
+def test_sync_account_transactions(fake_revolut, raw_history):
+    store = TransactionStore()
+    assert fake_revolut.sync_account_transactions(store) == len(raw_history)
+    assert len(store) == len(raw_history)
+    full_sync_calls = len(fake_revolut.client.calls)
+
+    # A new transaction, and a recent one whose state changed
+    fake_revolut.client.raw_transactions.insert(0, make_raw_transaction(10))
+    fake_revolut.client.raw_transactions[1]["state"] = "DECLINED"
+
+    fake_revolut.client.calls = []
+    fake_revolut.sync_account_transactions(store,
+                                           overlap=timedelta(hours=2))
+    assert len(fake_revolut.client.calls) < full_sync_calls
+    assert len(store) == len(raw_history) + 1
+    assert store.raw_transactions()[1]["state"] == "DECLINED"
+
+    from_date = datetime.fromtimestamp(
+        make_raw_transaction(8)["startedDate"] / 1000)
+    assert len(store.account_transactions(from_date=from_date)) == 3
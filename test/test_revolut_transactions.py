@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+import io
+import types
+import revolut
+from revolut import AccountTransaction, AccountTransactions, Revolut
+from revolut import write_account_transactions_csv
+
+from conftest import FakeClient, make_raw_transaction
+
+# To be tested with : python -m pytest -vs test/test_revolut_transactions.py
+
+
+def test_iter_account_transactions(fake_revolut, raw_history):
+    transactions = fake_revolut.iter_account_transactions()
+    assert type(transactions) == types.GeneratorType
+    first_transaction = next(transactions)
+    assert type(first_transaction) == AccountTransaction
+    # Only the first page was requested
+    assert len(fake_revolut.client.calls) == 1
+    assert 1 + len(list(transactions)) == len(raw_history)
+
+    raw_transactions = list(fake_revolut.iter_raw_account_transactions())
+    assert raw_transactions == fake_revolut.client.raw_transactions
+
+
+def test_write_account_transactions_csv(fake_revolut):
+    account_transactions = fake_revolut.get_account_transactions()
+    for lang in ["fr", "en"]:
+        csv_file = io.StringIO()
+        write_account_transactions_csv(
+            csv_file, fake_revolut.iter_account_transactions(), lang=lang)
+        assert csv_file.getvalue() == account_transactions.csv(lang=lang) + \
+            "\n"
+
+
+def test_account_transactions_csv(raw_history):
+    raw_history[0]["description"] = "amazon.fr; order 1"
+    raw_history[1]["state"] = "DECLINED"
+    account_transactions = AccountTransactions(raw_history[:3])
+    # Without the dates, which depend on the time zone
+    csv_fr = account_transactions.csv(lang="fr").split("\n")
+    assert [line.split(";", 1)[1] for line in csv_fr[1:]] == [
+        '"amazon.fr; order 1";0,0;EUR',
+        'Shop 2;-2,0;EUR',
+    ]
+    csv_en = account_transactions.csv(lang="en", reverse=True).split("\n")
+    assert [line.split(",", 1)[1] for line in csv_en[1:]] == [
+        'Shop 2,-2.0,EUR',
+        'amazon.fr; order 1,0.0,EUR',
+    ]
+
+
+def test_get_account_transactions_by_window(fake_revolut, raw_history):
+    from_date = datetime.fromtimestamp(
+        raw_history[0]["startedDate"] / 1000)
+    to_date = datetime.fromtimestamp(
+        raw_history[-1]["startedDate"] / 1000 + 1)
+    sequential = fake_revolut.get_account_transactions(from_date=from_date,
+                                                       to_date=to_date)
+    by_window = fake_revolut.get_account_transactions(
+        from_date=from_date, to_date=to_date,
+        workers=4, window=timedelta(hours=2))
+    assert len(sequential) == len(raw_history)
+    assert by_window.raw_list == sequential.raw_list
+
+
+def test_get_account_transactions_by_window_to_now(raw_history):
+    # A transaction started after the last whole second (or in the future)
+    raw_history.append(make_raw_transaction(0))
+    raw_history[-1].update(id="id_now", startedDate=int(
+        (datetime.now() + timedelta(hours=1)).timestamp() * 1000))
+    revolut = Revolut(token="fake_token", device_id="fake_device")
+    revolut.client = FakeClient(raw_history)
+    from_date = datetime.fromtimestamp(
+        raw_history[0]["startedDate"] / 1000)
+    sequential = revolut.get_account_transactions(from_date=from_date)
+    by_window = revolut.get_account_transactions(
+        from_date=from_date, workers=4, window=timedelta(days=365))
+    assert sequential.raw_list[0]["id"] == "id_now"
+    assert by_window.raw_list == sequential.raw_list
+
+
+def test_account_transactions_lazy(fake_revolut, raw_history, monkeypatch):
+    built = []
+    account_transaction_from_raw = revolut._account_transaction_from_raw
+
+    def counted_account_transaction_from_raw(transaction):
+        built.append(transaction["id"])
+        return account_transaction_from_raw(transaction)
+
+    monkeypatch.setattr(revolut, "_account_transaction_from_raw",
+                        counted_account_transaction_from_raw)
+    account_transactions = fake_revolut.get_account_transactions()
+    assert len(account_transactions) == len(raw_history)
+    assert len(account_transactions.raw_list) == len(raw_history)
+    assert built == []
+
+    last_transaction = account_transactions[-1]
+    assert type(last_transaction) == AccountTransaction
+    assert account_transactions[-1] is last_transaction
+    assert [t.description for t in account_transactions[:2]] == [
+        "Shop 9", "Shop 8"]
+    assert len(built) == 3
+
+    assert len(account_transactions.list) == len(raw_history)
+    assert [t.description for t in reversed(account_transactions)][0] == \
+        "Shop 0"
+    assert len(built) == len(raw_history)
@@ -0,0 +1,51 @@
+from revolut import Amount, Revolut
+
+# To be tested with : python -m pytest -vs test/test_revolut_wallet.py
+
+
+def test_wallet_cache(stub_server):
+    balances = [1000, 500]
+    stub_server.routes[("GET", "/user/current/wallet")] = \
+        lambda params, body: (200, {"id": "wallet_id", "pockets": [
+            {"id": "pocket_id", "balance": balances[0], "currency": "EUR",
+             "type": "CURRENT", "state": "ACTIVE"}]}, {})
+    stub_server.routes[("POST", "/exchange")] = \
+        lambda params, body: (200, [{"state": "COMPLETED", "counterpart": {
+            "amount": 1000, "currency": "BTC"}}], {})
+    revolut = Revolut(token="fake_token", device_id="fake_device",
+                      api_base=stub_server.api_base, wallet_cache_ttl=60)
+
+    accounts = revolut.get_account_balances()
+    assert str(accounts.get_account_by_name("EUR CURRENT").balance) == \
+        "10.00 EUR"
+    assert revolut.get_wallet_id() == "wallet_id"
+    assert revolut.get_pockets()[0]["id"] == "pocket_id"
+    assert len(stub_server.requests) == 1
+
+    # The wallet is downloaded again after an exchange
+    balances.pop(0)
+    revolut.exchange(Amount(real_amount=5, currency="EUR"), "BTC")
+    accounts = revolut.get_account_balances()
+    assert str(accounts.get_account_by_name("EUR CURRENT").balance) == \
+        "5.00 EUR"
+    assert len(stub_server.requests) == 3
+
+    revolut.get_wallet(refresh=True)
+    assert len(stub_server.requests) == 4
+
+
+def test_wallet_cache_disabled(stub_server):
+    stub_server.routes[("GET", "/user/current/wallet")] = \
+        lambda params, body: (200, {"id": "wallet_id", "pockets": []}, {})
+    revolut = Revolut(token="fake_token", device_id="fake_device",
+                      api_base=stub_server.api_base, wallet_cache_ttl=0)
+    revolut.get_wallet_id()
+    revolut.get_account_balances()
+    assert len(stub_server.requests) == 2
+
+    # Disabled by default
+    revolut = Revolut(token="fake_token", device_id="fake_device",
+                      api_base=stub_server.api_base)
+    revolut.get_wallet_id()
+    revolut.get_pockets()
+    assert len(stub_server.requests) == 4